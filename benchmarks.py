@@ -0,0 +1,387 @@
+"""
+Benchmarks del launcher sin conexión a internet.
+
+Un StandInServer (devserver.py) hace de CDN: sirve un manifiesto de versiones, una versión
+sintética (JSON, jar del cliente, librerías, índice y objetos de assets) y jars de mods con
+su fabric.mod.json, con la latencia y el ancho de banda que se indiquen. Se miden:
+
+  startup        tiempo hasta el primer frame (python launcher.py --profile-startup)
+  resize         layout_buttons durante el arrastre (BILINEAR) y en la pasada final (LANCZOS)
+  mod_download   rendimiento del motor de descargas con un lote de mods
+  install        install_version completo en una carpeta vacía
+  command        get_minecraft_command frente a LaunchCommandCache (sin caché y con caché)
+  mod_index      lectura de los fabric.mod.json de mods/ (desde cero e incremental)
+
+Las pruebas de Tk necesitan una pantalla: si no hay DISPLAY se arranca Xvfb cuando está
+instalado y, si no lo está, se marcan como omitidas. Los resultados se escriben en JSON
+(--output); con --baseline se comparan con una ejecución anterior y el proceso termina con
+código 1 si alguna mediana empeora más de --tolerance.
+
+    python benchmarks.py --latency 0.02 --bandwidth 20 --runs 5 --only install,command
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import devserver
+import launcher
+
+VERSION_ID = "bench-1.0"
+BENCH_LIBRARIES = 60
+BENCH_LIBRARY_SIZE = 256 * 1024
+BENCH_CLIENT_SIZE = 8 * 1024 * 1024
+BENCH_ASSETS = 1000
+BENCH_MODS = 12
+BENCH_MOD_SIZE = 512 * 1024
+BENCH_NESTED_JARS = 40  # Módulos anidados del jar que hace de Fabric API
+RESIZE_STEPS = 30
+
+BENCHMARKS: dict[str, Callable] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def register(func: Callable) -> Callable:
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def summarize(samples: list[float], **extra) -> dict:
+    """Mediana, mínimo y máximo en milisegundos de una lista de tiempos en segundos."""
+    return dict(runs=len(samples), median_ms=round(statistics.median(samples) * 1000, 2),
+                min_ms=round(min(samples) * 1000, 2), max_ms=round(max(samples) * 1000, 2), **extra)
+
+
+def measure(func: Callable[[], object], runs: int, setup: Optional[Callable[[], object]] = None) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def mod_jar(mod_id: str, version: str, depends: dict, size: int, nested: int = 0) -> bytes:
+    """Jar de mod sintético: fabric.mod.json, una carga de datos aleatorios y jars anidados opcionales."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as jar:
+        jars = []
+        for i in range(nested):
+            path = f"META-INF/jars/{mod_id}-module-{i}.jar"
+            jar.writestr(path, mod_jar(f"{mod_id}-module-{i}", "1.0.0", {"fabricloader": ">=0.16"}, 4096))
+            jars.append({"file": path})
+        jar.writestr(launcher.MOD_METADATA, json.dumps({
+            "schemaVersion": 1, "id": mod_id, "version": version, "name": mod_id,
+            "depends": depends, "jars": jars}))
+        jar.writestr("data.bin", os.urandom(size))
+    return buffer.getvalue()
+
+
+class SyntheticCDN:
+    """Contenido de la CDN de pruebas, servido por un StandInServer ya creado."""
+
+    def __init__(self, server: devserver.StandInServer) -> None:
+        self.server = server
+        files = server.files
+
+        def add(path: str, data: bytes) -> dict:
+            files[path] = data
+            return {"url": server.url(path), "sha1": hashlib.sha1(data).hexdigest(), "size": len(data)}
+
+        objects = {}
+        for i in range(BENCH_ASSETS):
+            data = os.urandom(1024 + i * 7 % 8192)
+            h = hashlib.sha1(data).hexdigest()
+            files[f"/assets/{h[:2]}/{h}"] = data
+            objects[f"minecraft/bench/{i}.ogg"] = {"hash": h, "size": len(data)}
+        asset_index = add("/indexes/bench.json", json.dumps({"objects": objects}).encode())
+        libraries = []
+        for i in range(BENCH_LIBRARIES):
+            path = f"com/example/lib{i}/1.0/lib{i}-1.0.jar"
+            libraries.append({"name": f"com.example:lib{i}:1.0",
+                              "downloads": {"artifact": dict(add(f"/libraries/{path}", os.urandom(BENCH_LIBRARY_SIZE)),
+                                                             path=path)}})
+        version = {
+            "id": VERSION_ID, "type": "release", "mainClass": "net.minecraft.client.main.Main",
+            "minecraftArguments": "--username ${auth_player_name} --version ${version_name} "
+                                  "--gameDir ${game_directory} --assetsDir ${assets_root} "
+                                  "--assetIndex ${assets_index_name} --uuid ${auth_uuid} "
+                                  "--accessToken ${auth_access_token}",
+            "assets": "bench", "assetIndex": dict(asset_index, id="bench"),
+            "downloads": {"client": add("/client.jar", os.urandom(BENCH_CLIENT_SIZE))},
+            "libraries": libraries,
+        }
+        entry = add(f"/versions/{VERSION_ID}.json", json.dumps(version).encode())
+        manifest = {"versions": [{"id": VERSION_ID, "type": "release", "url": entry["url"], "sha1": entry["sha1"]}]}
+        files["/version_manifest_v2.json"] = json.dumps(manifest).encode()
+
+        self.mods = [("fabric-api", server.url("/mods/fabric-api.jar"))]
+        files["/mods/fabric-api.jar"] = mod_jar("fabric-api", "0.118.0+1.21.4", {"minecraft": "1.21.4"},
+                                                BENCH_MOD_SIZE, nested=BENCH_NESTED_JARS)
+        for i in range(BENCH_MODS - 1):
+            files[f"/mods/mod{i}.jar"] = mod_jar(f"mod{i}", "1.0.0", {"fabric-api": "*", "minecraft": "~1.21.4"},
+                                                 BENCH_MOD_SIZE)
+            self.mods.append((f"mod{i}", server.url(f"/mods/mod{i}.jar")))
+
+    def install_urls(self) -> None:
+        """Apunta las URLs fijas del launcher a este servidor."""
+        launcher.VERSION_MANIFEST_URL = self.server.url("/version_manifest_v2.json")
+        launcher.ASSET_OBJECTS_URL = self.server.url("/assets")
+
+
+@contextmanager
+def virtual_display():
+    """Garantiza una pantalla para Tk: la actual, o un Xvfb temporal. Devuelve False si no hay ninguna."""
+    if os.name == "nt" or sys.platform == "darwin" or os.environ.get("DISPLAY"):
+        yield True
+        return
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        yield False
+        return
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+                               pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    try:
+        number = os.read(read_fd, 16).decode().strip()
+    finally:
+        os.close(read_fd)
+    os.environ["DISPLAY"] = f":{number}"
+    try:
+        yield True
+    finally:
+        process.terminate()
+        process.wait()
+        del os.environ["DISPLAY"]
+
+
+@benchmark("startup")
+def bench_startup(ctx: dict) -> dict:
+    if not ctx["display"]:
+        return {"skipped": "sin pantalla (instala Xvfb)"}
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "launcher.py")
+    first_frames = []
+
+    def run() -> None:
+        out = subprocess.run([sys.executable, script, "--profile-startup", "--minecraft-dir", ctx["tmp"]],
+                             capture_output=True, text=True, timeout=60)
+        match = re.search(r"primer frame.*?([\d.]+) ms", out.stdout)
+        if not match:
+            raise RuntimeError(f"--profile-startup no informó del primer frame: {out.stderr[-500:]}")
+        first_frames.append(float(match.group(1)) / 1000)
+
+    wall = measure(run, ctx["runs"])
+    # La mediana principal es el primer frame medido por el propio launcher; el proceso completo va aparte
+    return summarize(first_frames, process_median_ms=round(statistics.median(wall) * 1000, 2))
+
+
+class _BenchWindow(launcher.ResizableWindow):
+    def _after_first_frame(self) -> None:
+        pass  # Solo interesa la ventana: sin carpetas, índices ni diálogos
+
+
+@benchmark("resize")
+def bench_resize(ctx: dict) -> dict:
+    if not ctx["display"]:
+        return {"skipped": "sin pantalla (instala Xvfb)"}
+    window = _BenchWindow(minecraft_dir=ctx["tmp"])
+    try:
+        # Las imágenes reales no están en el repositorio: se usan imágenes sintéticas del mismo uso
+        window.source_images = {cfg[0]: launcher.Image.new("RGBA", (1024, 768), (40 * i, 90, 160, 255))
+                                for i, cfg in enumerate(window.button_configs)}
+        window.window.geometry("800x600")
+        window.window.update()
+        sizes = [(800 + i * 27, 600 + i * 15) for i in range(RESIZE_STEPS)]
+        drag, final, cached = [], [], []
+        for _ in range(ctx["runs"]):
+            window.images_cache = launcher.ScaledImageCache()
+            for w, h in sizes:
+                window.window.geometry(f"{w}x{h}")
+                window.window.update()
+                start = time.perf_counter()
+                window.layout_buttons(final=False)
+                window.window.update_idletasks()
+                drag.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            window.layout_buttons(final=True)
+            window.window.update_idletasks()
+            final.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            window.layout_buttons(final=True)
+            window.window.update_idletasks()
+            cached.append(time.perf_counter() - start)
+    finally:
+        window.window.destroy()
+    return summarize(drag, final=summarize(final), final_cached=summarize(cached))
+
+
+@benchmark("mod_download")
+def bench_mod_download(ctx: dict) -> dict:
+    cdn = ctx["cdn"]
+    dest = os.path.join(ctx["tmp"], "download")
+    total = sum(len(cdn.server.files[launcher.urllib.parse.urlparse(url).path]) for _, url in cdn.mods)
+
+    def run() -> None:
+        engine = launcher.DownloadEngine()
+        jobs = [launcher.DownloadJob(name, url, os.path.join(dest, launcher.filename_from_url(url)),
+                                     priority=launcher.PRIORITY_OPTIONAL) for name, url in cdn.mods]
+        if not all(r.ok for r in engine.run(jobs)):
+            raise RuntimeError("falló la descarga de mods")
+
+    samples = measure(run, ctx["runs"], setup=lambda: shutil.rmtree(dest, ignore_errors=True))
+    return summarize(samples, files=len(cdn.mods), mib_per_s=round(total / 1048576 / statistics.median(samples), 2))
+
+
+@benchmark("install")
+def bench_install(ctx: dict) -> dict:
+    target = os.path.join(ctx["tmp"], "install")
+    requests_made = []
+
+    def setup() -> None:
+        shutil.rmtree(target, ignore_errors=True)
+        ctx["cdn"].server.requests.clear()
+
+    def run() -> None:
+        launcher.install_version(target, VERSION_ID, launcher.DownloadEngine())
+        requests_made.append(len(ctx["cdn"].server.requests))
+
+    samples = measure(run, ctx["runs"], setup=setup)
+    ctx["installed"] = target  # Lo reutiliza el benchmark de resolución de comandos
+    return summarize(samples, files=BENCH_LIBRARIES + BENCH_ASSETS + 3, requests=requests_made[-1])
+
+
+@benchmark("command")
+def bench_command(ctx: dict) -> dict:
+    target = ctx.get("installed")
+    if not target:
+        target = os.path.join(ctx["tmp"], "install")
+        launcher.install_version(target, VERSION_ID, launcher.DownloadEngine())
+        ctx["installed"] = target
+    options = {"username": "Bench", "uuid": "", "token": "", "jvmArguments": ["-Xmx2048M"],
+               "launcherVersion": launcher.LAUNCHER_VERSION}
+    direct = measure(lambda: launcher.minecraft_launcher_lib.command.get_minecraft_command(
+        VERSION_ID, target, dict(options)), ctx["runs"])
+    cache_dir = os.path.join(target, "cache", "commands")
+    cold = measure(lambda: launcher.LaunchCommandCache(target).get(VERSION_ID, options), ctx["runs"],
+                   setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    cache = launcher.LaunchCommandCache(target)
+    warm = measure(lambda: cache.get(VERSION_ID, options), ctx["runs"])
+    return summarize(warm, get_minecraft_command=summarize(direct), cache_cold=summarize(cold))
+
+
+@benchmark("mod_index")
+def bench_mod_index(ctx: dict) -> dict:
+    root = os.path.join(ctx["tmp"], "modindex")
+    mods_dir = os.path.join(root, "mods")
+    os.makedirs(mods_dir, exist_ok=True)
+    for name, url in ctx["cdn"].mods:
+        with open(os.path.join(mods_dir, launcher.filename_from_url(url)), "wb") as f:
+            f.write(ctx["cdn"].server.files[launcher.urllib.parse.urlparse(url).path])
+    index_path = os.path.join(root, "cache", "mods.json")
+
+    def drop_index() -> None:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    cold = measure(lambda: launcher.ModIndex(root).check("1.21.4", "0.16.10"), ctx["runs"], setup=drop_index)
+    warm = measure(lambda: launcher.ModIndex(root).check("1.21.4", "0.16.10"), ctx["runs"])
+    return summarize(warm, cold=summarize(cold), jars=len(ctx["cdn"].mods))
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Benchmarks cuya mediana empeora más de tolerance (fracción) respecto a la referencia."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name, {})
+        if "median_ms" in result and before.get("median_ms"):
+            ratio = result["median_ms"] / before["median_ms"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{name}: {before['median_ms']:.2f} ms -> {result['median_ms']:.2f} ms "
+                                   f"(+{(ratio - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks del launcher con servidores locales")
+    parser.add_argument("--runs", type=int, default=5, help="repeticiones de cada medida")
+    parser.add_argument("--latency", type=float, default=0.0, help="latencia por petición en segundos")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="ancho de banda por conexión en MiB/s (0 = sin límite)")
+    parser.add_argument("--only", help=f"lista separada por comas de: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default="benchmark_results.json", help="archivo JSON de resultados")
+    parser.add_argument("--baseline", help="resultados anteriores con los que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="empeoramiento admitido (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        print(f"Benchmarks desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    tmp = tempfile.mkdtemp(prefix="mncka-bench-")
+    results = {}
+    try:
+        bandwidth = args.bandwidth * 1048576 if args.bandwidth else None
+        with devserver.StandInServer(latency=args.latency, bandwidth=bandwidth) as server, \
+                virtual_display() as display:
+            cdn = SyntheticCDN(server)
+            cdn.install_urls()
+            ctx = {"runs": args.runs, "tmp": tmp, "cdn": cdn, "display": display}
+            for name in names:
+                try:
+                    results[name] = BENCHMARKS[name](ctx)
+                except Exception as e:
+                    logging.exception(f"Error en el benchmark {name}")
+                    results[name] = {"error": str(e)}
+                result = results[name]
+                if "median_ms" in result:
+                    print(f"  {name:<14} {result['median_ms']:10.2f} ms  (mín. {result['min_ms']:.2f}, "
+                          f"máx. {result['max_ms']:.2f}, {result['runs']} ejecuciones)")
+                else:
+                    print(f"  {name:<14} {result.get('skipped') or 'ERROR: ' + result.get('error', '')}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    report = {
+        "launcher_version": launcher.LAUNCHER_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "network": {"latency_s": args.latency, "bandwidth_mib_s": args.bandwidth},
+        "results": results,
+    }
+    launcher.write_json_atomic(args.output, report)
+    print(f"Resultados en {args.output}")
+    if any("error" in r for r in results.values()):
+        return 1
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
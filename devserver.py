@@ -0,0 +1,229 @@
+"""
+Servidor HTTP local que sustituye al CDN durante el desarrollo.
+
+Sirve archivos en memoria con soporte de peticiones Range y puede simular enlaces
+inestables: cortar la conexión a mitad de la transferencia, responder con errores HTTP,
+añadir latencia o limitar el ancho de banda.
+
+Ejecutado directamente (python devserver.py) comprueba que el motor de descargas de
+launcher.py reanuda una descarga cortada, verifica el SHA-1, omite archivos ya completos,
+recurre a un espejo cuando el origen falla y respeta el límite de ancho de banda.
+"""
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StandInServer"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Evita esperas de 40 ms (Nagle + ACK retardado) entre cabecera y cuerpo
+
+    def log_message(self, format: str, *args) -> None:  # Silencia el log por petición
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.record(self.path, self.headers.get("Range"))
+        if server.latency:
+            time.sleep(server.latency)
+        status = server.take_error()
+        if status:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = server.files.get(self.path.split("?")[0])
+        if data is None:
+            self.send_error(404)
+            return
+        start, end = 0, len(data) - 1
+        status = 200
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header("Content-Type", "application/java-archive")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        limit = server.take_drop()
+        sent = 0
+        block = 64 * 1024
+        while sent < len(body):
+            piece = body[sent:sent + block]
+            if limit is not None and sent + len(piece) > limit:
+                # Simula un corte de red: se envía parte del bloque y se cierra el socket
+                self.wfile.write(piece[:max(limit - sent, 0)])
+                self.wfile.flush()
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(piece)
+            sent += len(piece)
+            if server.bandwidth:
+                time.sleep(len(piece) / server.bandwidth)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP local en un puerto libre. files asocia rutas ("/mods/a.jar") con su contenido.
+    drop_after corta cada una de las próximas drop_count respuestas tras ese número de bytes;
+    las próximas error_count peticiones reciben error_status (p. ej. 503) sin cuerpo;
+    latency (segundos) se añade antes de cada respuesta y bandwidth (bytes/s) limita la velocidad.
+    """
+    daemon_threads = True
+
+    def __init__(self, files: Optional[dict[str, bytes]] = None, drop_after: Optional[int] = None,
+                 drop_count: int = 0, latency: float = 0.0, bandwidth: Optional[float] = None,
+                 error_status: int = 503, error_count: int = 0) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.files: dict[str, bytes] = dict(files or {})
+        self.drop_after = drop_after
+        self.drop_count = drop_count
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_status = error_status
+        self.error_count = error_count
+        self.requests: list[tuple[str, Optional[str]]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def record(self, path: str, range_header: Optional[str]) -> None:
+        with self._lock:
+            self.requests.append((path, range_header))
+
+    def take_drop(self) -> Optional[int]:
+        """Devuelve el límite de bytes de la respuesta actual si debe cortarse."""
+        with self._lock:
+            if self.drop_after is None or self.drop_count <= 0:
+                return None
+            self.drop_count -= 1
+            return self.drop_after
+
+    def take_error(self) -> Optional[int]:
+        """Devuelve el código de error con el que responder a la petición actual, si toca."""
+        with self._lock:
+            if self.error_count <= 0:
+                return None
+            self.error_count -= 1
+            return self.error_status
+
+    def __enter__(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _self_check() -> int:
+    """
+    Comprueba reanudación, verificación, omisión de archivos completos, espejos, límite de ancho
+    de banda y planificador con el motor real.
+    """
+    import launcher
+
+    payload = os.urandom(5 * 1024 * 1024)
+    sha1 = hashlib.sha1(payload).hexdigest()
+    tmp = tempfile.mkdtemp(prefix="mncka-devserver-")
+    try:
+        with StandInServer({"/mods/test.jar": payload}, drop_after=1024 * 1024, drop_count=2) as server:
+            engine = launcher.DownloadEngine()
+            dest = os.path.join(tmp, "mods", "test.jar")
+            job = launcher.DownloadJob("test", server.url("/mods/test.jar"), dest, len(payload), sha1)
+            result = engine.run([job])[0]
+            ranges = [r for _, r in server.requests if r]
+            assert result.ok, result.error
+            assert open(dest, "rb").read() == payload, "contenido distinto"
+            assert not os.path.exists(dest + launcher.PART_SUFFIX), "quedó un .part"
+            assert len(ranges) == 2, f"se esperaban 2 reanudaciones, hubo {ranges}"
+            print(f"Reanudación OK: {len(server.requests)} peticiones, Range usados: {ranges}")
+
+            server.requests.clear()
+            result = engine.run([job])[0]
+            assert result.skipped and not server.requests, "no se omitió el archivo completo"
+            print("Omisión de archivo verificado OK")
+
+            bad = launcher.DownloadJob("bad", server.url("/mods/test.jar"), os.path.join(tmp, "bad.jar"),
+                                       sha1="0" * 40)
+            result = engine.run([bad])[0]
+            assert not result.ok and not os.path.exists(bad.dest), "se aceptó un hash incorrecto"
+            assert not os.path.exists(bad.dest + launcher.PART_SUFFIX)
+            print("Rechazo por hash OK")
+
+        small = os.urandom(256 * 1024)
+        with StandInServer({"/mods/a.jar": small}, error_count=100) as primary, \
+                StandInServer({"/mods/a.jar": small}) as mirror:
+            engine = launcher.DownloadEngine(mirrors={primary.url(""): [mirror.url("")]})
+            dest = os.path.join(tmp, "mirror", "a.jar")
+            job = launcher.DownloadJob("a", primary.url("/mods/a.jar"), dest, len(small),
+                                       hashlib.sha1(small).hexdigest())
+            result = engine.run([job])[0]
+            assert result.ok, result.error
+            assert len(primary.requests) == 1 and len(mirror.requests) == 1, "no se recurrió al espejo"
+            print("Espejo tras error 503 OK")
+
+        with StandInServer({"/mods/a.jar": small}) as server:
+            engine = launcher.DownloadEngine(limit_mb=1)
+            start = time.perf_counter()
+            jobs = [launcher.DownloadJob(f"a{i}", server.url("/mods/a.jar"), os.path.join(tmp, "bw", f"a{i}.jar"))
+                    for i in range(8)]
+            assert all(r.ok for r in engine.run(jobs))
+            elapsed = time.perf_counter() - start
+            # 2 MiB a 1 MiB/s con un segundo de ráfaga inicial: al menos ~1 s
+            assert elapsed >= 0.9, f"no se respetó el límite de ancho de banda ({elapsed:.2f} s)"
+            print(f"Límite de ancho de banda OK ({len(jobs) * len(small) / 1048576:.0f} MiB en {elapsed:.2f} s)")
+
+        # Dos huecos que se liberan seguidos con dos trabajos en espera: ambos deben arrancar,
+        # aunque el de menor prioridad se despierte primero y ceda el turno al otro
+        for _ in range(50):
+            scheduler = launcher.DownloadScheduler(2, 2)
+            scheduler.acquire("h")
+            scheduler.acquire("h")
+            waiters = [threading.Thread(target=scheduler.acquire, args=("h", priority), daemon=True)
+                       for priority in (10, 0)]
+            for waiter in waiters:
+                waiter.start()
+            while len(scheduler._waiting) < 2:
+                time.sleep(0.001)
+            scheduler.release("h")
+            scheduler.release("h")
+            for waiter in waiters:
+                waiter.join(timeout=1)
+            assert scheduler.active == 2 and not scheduler._waiting, "un trabajo siguió esperando con un hueco libre"
+        print("Planificador sin esperas con huecos libres OK")
+    except AssertionError as e:
+        print(f"FALLO: {e}")
+        return 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_self_check())
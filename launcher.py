@@ -1,62 +1,2829 @@
+from __future__ import annotations
+
+import time
+_T0 = time.perf_counter()  # Referencia para medir el tiempo hasta el primer frame
+
 import sys
 import os
-import time
+import argparse
+import contextlib
+import importlib
+import io
 import tkinter as tk
 from tkinter import messagebox, ttk
-from PIL import Image, ImageTk
 import subprocess
-import pygame
-import minecraft_launcher_lib
-import requests
 import urllib.parse
+import hashlib
+import json
+import shutil
+import sqlite3
 import threading
 import logging
-import webbrowser
+import logging.handlers
+import mmap
+import multiprocessing
 import platform
+import queue
+import random
+import re
+import zipfile
+from collections import OrderedDict, deque
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Configuración del logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Evita el mensaje de bienvenida de pygame al importarlo
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+
+class StartupProfiler:
+    """Registra la duración de cada fase del arranque (importaciones e inicialización)."""
+
+    def __init__(self) -> None:
+        self.phases: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases.append((name, seconds))
+
+    def phase(self, name: str) -> "_Phase":
+        return _Phase(self, name)
+
+    def report(self, first_frame: float) -> str:
+        """Informe legible con cada fase y el tiempo total hasta el primer frame."""
+        lines = ["Perfil de arranque:"]
+        with self._lock:
+            phases = list(self.phases)
+        for name, seconds in phases:
+            lines.append(f"  {name:<40} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'primer frame (desde el inicio del módulo)':<40} {first_frame * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+class _Phase:
+    def __init__(self, profiler: StartupProfiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> "_Phase":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+STARTUP = StartupProfiler()
+STARTUP.record("importaciones de la biblioteca estándar", time.perf_counter() - _T0)
+
+# Trazas internas (--trace o MNCKA_TRACE=1): spans que conserva el búfer circular
+TRACE_BUFFER_SIZE = 4096
+
+
+class Span:
+    """Operación medida. Se usa como context manager; set() añade atributos (bytes, reintentos...)."""
+    __slots__ = ("tracer", "name", "attrs", "start", "duration", "thread")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.duration = 0.0
+        self.thread = threading.current_thread().name
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.add(self)
+
+
+class _NoSpan:
+    """Span vacío que se devuelve con las trazas desactivadas: no mide ni guarda nada."""
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Registro de spans en un búfer circular (los TRACE_BUFFER_SIZE más recientes) más totales
+    acumulados por nombre para las métricas. Desactivado, span() solo comprueba un booleano y
+    devuelve NO_SPAN. Se exporta como JSON lines (un span por línea) o texto de Prometheus.
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE) -> None:
+        self.enabled = False
+        self.spans: deque[Span] = deque(maxlen=capacity)
+        self.totals: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._epoch = time.time() - time.perf_counter()  # Convierte perf_counter a hora de reloj
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, attrs)
+
+    def record(self, name: str, seconds: float, end: Optional[float] = None, **attrs) -> None:
+        """Añade un span ya medido por otros medios (fases de arranque, tiempo hasta la ventana)."""
+        if not self.enabled:
+            return
+        span = Span(self, name, attrs)
+        span.start = (end if end is not None else time.perf_counter()) - seconds
+        span.duration = seconds
+        self.add(span)
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            total = self.totals.setdefault(span.name, {"count": 0, "seconds": 0.0, "max": 0.0,
+                                                       "bytes": 0, "retries": 0, "errors": 0})
+            total["count"] += 1
+            total["seconds"] += span.duration
+            total["max"] = max(total["max"], span.duration)
+            total["bytes"] += span.attrs.get("bytes") or 0
+            total["retries"] += span.attrs.get("retries") or 0
+            total["errors"] += "error" in span.attrs
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            spans = list(self.spans)
+        return [{"name": s.name, "start": round(self._epoch + s.start, 6), "duration_ms": round(s.duration * 1000, 3),
+                 "thread": s.thread, **s.attrs} for s in spans]
+
+    def export_jsonl(self, path: str) -> int:
+        """Escribe los spans del búfer en path (JSON lines). Devuelve cuántos se escribieron."""
+        spans = self.snapshot()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+        return len(spans)
+
+    def summary(self) -> dict[str, dict]:
+        """Copia de los totales acumulados por nombre de span (count, seconds, max, bytes...)."""
+        with self._lock:
+            return {name: dict(t) for name, t in sorted(self.totals.items())}
+
+    def prometheus(self) -> str:
+        """Totales por nombre de span en el formato de texto de Prometheus."""
+        totals = self.summary()
+        metrics = [
+            ("mncka_span_duration_seconds", "summary", "Duración de las operaciones del launcher", None),
+            ("mncka_span_max_seconds", "gauge", "Duración máxima observada", "max"),
+            ("mncka_bytes_total", "counter", "Bytes transferidos", "bytes"),
+            ("mncka_retries_total", "counter", "Reintentos de descarga", "retries"),
+            ("mncka_span_errors_total", "counter", "Operaciones terminadas con error", "errors"),
+        ]
+        lines = []
+        for metric, kind, help_text, key in metrics:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for name, t in totals.items():
+                label = f'{{span="{name}"}}'
+                if key is None:
+                    lines.append(f"{metric}_count{label} {t['count']}")
+                    lines.append(f"{metric}_sum{label} {t['seconds']:.6f}")
+                elif key == "max" or t[key]:
+                    lines.append(f"{metric}{label} {t[key]:.6f}" if key == "max" else f"{metric}{label} {t[key]}")
+        return "\n".join(lines) + "\n"
+
+
+TRACER = Tracer()
+if os.environ.get("MNCKA_TRACE", "0") not in ("", "0"):
+    TRACER.enable()
+
+
+class LazyModule:
+    """
+    Sustituto de un módulo pesado que solo se importa la primera vez que se accede a uno de
+    sus atributos (o al llamar a load(), p. ej. desde el hilo de precalentamiento).
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with STARTUP.phase(f"import {self._name}"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+
+# Módulos pesados: se cargan bajo demanda para no retrasar la aparición de la ventana
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+pygame = LazyModule("pygame")
+minecraft_launcher_lib = LazyModule("minecraft_launcher_lib")
+requests = LazyModule("requests")
+webbrowser = LazyModule("webbrowser")
+
+def resource_path(relative_path: str) -> str:
+    """Obtiene la ruta absoluta al recurso, tanto en desarrollo como en modo frozen."""
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
+
+# URLs fijas de mods
+SODIUM_URL = "https://cdn.modrinth.com/data/AANobbMI/versions/FRXt5xaI/sodium-fabric-0.6.10%2Bmc1.21.4.jar"
+LITHIUM_URL = "https://cdn.modrinth.com/data/gvQqBUqZ/versions/kLc5Oxr4/lithium-fabric-0.14.8%2Bmc1.21.4.jar"
+SKIN_OVERRIDES_URL = "https://cdn.modrinth.com/data/GON0Fdk5/versions/MU0u3ea4/skin_overrides-2.2.3%2B1.21.4.jar"
+FABRIC_API_URL = "https://cdn.modrinth.com/data/P7dR8mSH/versions/ZNwYCTsk/fabric-api-0.118.0%2B1.21.4.jar"
+
+# Mods conocidos por nombre (los que ofrece el launcher)
+KNOWN_MODS = {
+    "FabricAPI": FABRIC_API_URL,
+    "Sodium": SODIUM_URL,
+    "Lithium": LITHIUM_URL,
+    "SkinOverrides": SKIN_OVERRIDES_URL,
+}
+
+FABRIC_LOADER_VERSION = "0.16.10"  # Versión actualizada de Fabric
+INDEX_FILENAME = "launcher_index.json"
+FABRIC_API_ID = "fabric-api"
+MOD_METADATA = "fabric.mod.json"
+MOD_NESTING_DEPTH = 3  # Fabric API anida sus módulos en META-INF/jars
+SETTINGS_FILENAME = "launcher_settings.json"
+
+# Códigos de salida del modo sin interfaz (--provision)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_BAD_MANIFEST = 2
+LAUNCHER_VERSION = "1.0.0"
+
+# Marcadores que se guardan en la plantilla de comando y se rellenan en cada lanzamiento
+LAUNCH_PLACEHOLDERS = {"username": "${mncka_username}", "uuid": "${mncka_uuid}", "token": "${mncka_token}"}
+JVM_ARGS_PLACEHOLDER = "${mncka_jvm_arguments}"
+
+# Supervisión del proceso del juego
+GAME_SAMPLE_INTERVAL = 2.0  # Segundos entre muestras de memoria/CPU de la JVM
+GAME_LOG_MAX_BYTES = 5 * 1024 * 1024
+GAME_LOG_BACKUPS = 3
+OOM_MARKERS = ("java.lang.OutOfMemoryError", "There is insufficient memory for the Java Runtime Environment")
+CRASH_MARKERS = ("---- Minecraft Crash Report ----", "#@!@# Game crashed!")
+# Línea que Minecraft escribe al crear la ventana (LWJGL ya inicializado): marca el "tiempo hasta ventana"
+WINDOW_MARKERS = ("Backend library: LWJGL",)
+
+# Class-data sharing (AppCDS) de la JVM: archivos dinámicos desde Java 13, autogestionados desde Java 19
+CDS_MIN_JAVA = 13
+CDS_AUTO_JAVA = 19
+READAHEAD_CHUNK_SIZE = 1024 * 1024
+
+# Verificación de integridad: por debajo de este número de archivos no compensa arrancar procesos
+VERIFY_POOL_THRESHOLD = 64
+VERIFY_CHUNKSIZE = 32
+
+# Perfiles de la JVM. min_java es la versión mínima de Java que admite las opciones del perfil.
+JVM_PROFILES = {
+    "auto": {"label": "Automático", "min_java": 8, "args": []},
+    "g1": {
+        "label": "G1 baja latencia",
+        "min_java": 8,
+        "args": ["-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=50",
+                 "-XX:+UnlockExperimentalVMOptions", "-XX:G1NewSizePercent=30", "-XX:G1MaxNewSizePercent=40",
+                 "-XX:G1HeapRegionSize=8M", "-XX:G1ReservePercent=20", "-XX:InitiatingHeapOccupancyPercent=15",
+                 "-XX:+DisableExplicitGC"],
+    },
+    "zgc": {
+        "label": "ZGC (pausas mínimas)",
+        "min_java": 15,
+        "args": ["-XX:+UseZGC", "-XX:+DisableExplicitGC"],
+    },
+    "low_memory": {
+        "label": "Baja memoria",
+        "min_java": 8,
+        "args": ["-XX:+UseG1GC", "-XX:MaxGCPauseMillis=100", "-XX:MinHeapFreeRatio=10",
+                 "-XX:MaxHeapFreeRatio=30", "-XX:+UseStringDeduplication", "-XX:+DisableExplicitGC"],
+    },
+}
+JVM_BASE_HEAP_MB = 2048  # Vanilla
+JVM_FABRIC_HEAP_MB = 512  # Extra por Fabric + Fabric API
+JVM_HEAP_PER_MOD_MB = 96
+JVM_OS_RESERVE_MB = 4096  # Memoria que se deja al sistema en equipos de 8 GB o más
+
+# Despachador de eventos de la interfaz: un "frame" cada 16 ms, de los que como mucho 8 ms se
+# dedican a ejecutar callbacks encolados por los hilos de trabajo
+UI_FRAME_MS = 16
+UI_CALLBACK_BUDGET = 0.008
+
+# Presupuesto de memoria para las imágenes escaladas de los botones (RGBA, 4 bytes por píxel)
+IMAGE_CACHE_BUDGET = 48 * 1024 * 1024
+
+# Música: formatos de la carpeta songs/ y memoria máxima para las pistas decodificadas (PCM)
+MUSIC_EXTENSIONS = (".mp3", ".ogg", ".wav")
+MUSIC_DECODE_BUDGET = 128 * 1024 * 1024
+MUSIC_COMPRESSION_RATIO = 12  # Estimación PCM/comprimido (MP3 u OGG a ~128 kbps) antes de decodificar
+MUSIC_POLL_INTERVAL = 0.25  # Segundos entre comprobaciones del cambio de pista
+
+# Parámetros del motor de descargas
+DOWNLOAD_WORKERS = 8  # Transferencias simultáneas en total, sumando todos los lotes en curso
+DOWNLOAD_HOST_LIMIT = 4  # Transferencias simultáneas por host
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB por lectura/escritura
+DOWNLOAD_PROGRESS_INTERVAL = 0.1  # Segundos mínimos entre avisos de progreso
+DOWNLOAD_TIMEOUT = (10, 60)  # (conexión, lectura) en segundos
+DOWNLOAD_ATTEMPTS = 5  # Intentos por archivo; cada reintento reanuda con Range
+DOWNLOAD_BACKOFF = 0.5  # Espera base entre reintentos cuando todos los orígenes han fallado (se duplica)
+DOWNLOAD_BACKOFF_MAX = 8.0
+# Límite global de ancho de banda en MiB/s (0 = sin límite); también "download_limit_mb" en la configuración
+DOWNLOAD_LIMIT_MB = float(os.environ.get("MNCKA_DOWNLOAD_LIMIT_MB", "0"))
+# Prioridades (menor = antes): lo necesario para lanzar la versión va por delante de los mods
+PRIORITY_LAUNCH = 0
+PRIORITY_OPTIONAL = 10
+PART_SUFFIX = ".part"
+MODRINTH_API = "https://api.modrinth.com/v2"
+ASSET_OBJECTS_URL = "https://resources.download.minecraft.net"
+VERSION_MANIFEST_URL = "https://launchermeta.mojang.com/mc/game/version_manifest_v2.json"
+
+# Almacén de artefactos compartido entre todas las copias del launcher de la máquina
+STORE_MAX_BYTES = int(float(os.environ.get("MNCKA_STORE_MAX_GB", "20")) * 1024 ** 3)
+FICLONE = 0x40049409  # ioctl de Linux para reflinks (btrfs, xfs)
+
+
+def filename_from_url(url: str) -> str:
+    """Obtiene el nombre de archivo (decodificado) a partir de una URL."""
+    return urllib.parse.unquote(os.path.basename(urllib.parse.urlparse(url).path))
+
+
+def file_hash(path: str, algorithm: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Calcula el hash (sha1, sha512, ...) de un archivo leyendo en bloques."""
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class DownloadJob:
+    """
+    Una descarga individual: nombre visible, URL de origen y ruta de destino.
+    size, sha1 y sha512 son opcionales; si se conocen, se verifican al terminar y permiten
+    omitir archivos que ya están completos en disco. priority ordena la cola del planificador.
+    """
+    name: str
+    url: str
+    dest: str
+    size: Optional[int] = None
+    sha1: Optional[str] = None
+    sha512: Optional[str] = None
+    priority: int = PRIORITY_LAUNCH
+
+    def has_checksum(self) -> bool:
+        return bool(self.sha1 or self.sha512)
+
+    def mismatch(self, path: str) -> Optional[str]:
+        """Devuelve una descripción del fallo si el archivo no coincide con el tamaño/hashes esperados."""
+        actual_size = os.path.getsize(path)
+        if self.size is not None and actual_size != self.size:
+            return f"tamaño {actual_size} != {self.size}"
+        for algorithm in ("sha1", "sha512"):
+            expected = getattr(self, algorithm)
+            if expected and file_hash(path, algorithm) != expected.lower():
+                return f"{algorithm} no coincide"
+        return None
+
+    def is_complete(self) -> bool:
+        """Indica si el destino ya existe y coincide con un tamaño y hash conocidos."""
+        if not self.has_checksum() or not os.path.isfile(self.dest):
+            return False
+        return self.mismatch(self.dest) is None
+
+
+@dataclass
+class DownloadResult:
+    """Resultado de una descarga del lote."""
+    job: DownloadJob
+    ok: bool
+    bytes: int = 0
+    error: Optional[Exception] = None
+    skipped: bool = False
+    from_store: bool = False
+
+
+@dataclass
+class DownloadProgress:
+    """Progreso agregado de un lote de descargas."""
+    files_done: int
+    files_total: int
+    bytes_done: int
+    bytes_total: int
+    bytes_per_sec: float
+
+    @property
+    def percent(self) -> float:
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total * 100, 100)
+        if self.files_total:
+            return self.files_done / self.files_total * 100
+        return 100
+
+
+class TokenBucket:
+    """
+    Límite de ancho de banda compartido por todas las descargas (bytes/s). Admite ráfagas de
+    hasta un segundo de tráfico; consume() bloquea al hilo hasta que haya saldo suficiente.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                needed = min(amount, self.rate)  # Un bloque mayor que la ráfaga deja saldo negativo
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    """
+    Reparte las conexiones entre todos los lotes en curso de un motor: como mucho max_active
+    transferencias a la vez y host_limit por host. Al quedar un hueco libre lo obtiene el
+    trabajo en espera de mayor prioridad (menor número) cuyo host tenga capacidad; a igual
+    prioridad, el que llegó antes.
+    """
+
+    def __init__(self, max_active: int = DOWNLOAD_WORKERS, host_limit: int = DOWNLOAD_HOST_LIMIT) -> None:
+        self.max_active = max_active
+        self.host_limit = host_limit
+        self.active = 0
+        self.hosts: dict[str, int] = {}
+        self._waiting: list[tuple[int, int, str]] = []  # (prioridad, orden de llegada, host)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def _has_room(self, host: str) -> bool:
+        return self.active < self.max_active and self.hosts.get(host, 0) < self.host_limit
+
+    def _grantable(self, entry: tuple[int, int, str]) -> bool:
+        for other in self._waiting:  # Ordenada: solo se adelanta a quien no puede arrancar aún
+            if other == entry:
+                return True
+            if self._has_room(other[2]):
+                return False
+        return False
+
+    def acquire(self, host: str, priority: int = PRIORITY_LAUNCH) -> None:
+        with self._cond:
+            self._seq += 1
+            entry = (priority, self._seq, host)
+            self._waiting.append(entry)
+            self._waiting.sort()
+            while not (self._has_room(host) and self._grantable(entry)):
+                self._cond.wait()
+            self._waiting.remove(entry)
+            self.active += 1
+            self.hosts[host] = self.hosts.get(host, 0) + 1
+            if self._waiting and self.active < self.max_active:
+                # Quien se apartó por este trabajo puede estar dormido con otro hueco libre
+                self._cond.notify_all()
+
+    def release(self, host: str) -> None:
+        with self._cond:
+            self.active -= 1
+            self.hosts[host] -= 1
+            self._cond.notify_all()
+
+
+class DownloadEngine:
+    """
+    Motor de descargas concurrentes.
+    Usa una única sesión HTTP con un pool de conexiones keep-alive por host, de modo que
+    las descargas al mismo CDN reutilizan la conexión TLS en lugar de negociar una nueva.
+    Todas las transferencias pasan por un planificador común (prioridades y límite por host)
+    y, si se indica, por un límite global de ancho de banda. mirrors asocia el prefijo de una
+    URL ("https://cdn.modrinth.com") con prefijos alternativos que sirven los mismos archivos.
+    """
+
+    def __init__(self, max_workers: int = DOWNLOAD_WORKERS, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                 store: Optional["ArtifactStore"] = None, host_limit: int = DOWNLOAD_HOST_LIMIT,
+                 limit_mb: float = DOWNLOAD_LIMIT_MB, mirrors: Optional[dict[str, list[str]]] = None) -> None:
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.store = store
+        self.scheduler = DownloadScheduler(max_workers, host_limit)
+        self.bandwidth: Optional[TokenBucket] = None
+        self.mirrors: dict[str, list[str]] = {}
+        self.configure(limit_mb, mirrors)
+        self._failures: dict[str, int] = {}  # Fallos seguidos por host, para elegir el mejor espejo
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._dest_locks: dict[str, threading.Lock] = {}
+
+    def configure(self, limit_mb: float = 0, mirrors: Optional[dict[str, list[str]]] = None) -> None:
+        """Cambia el límite de ancho de banda (MiB/s, 0 = sin límite) y los espejos."""
+        self.bandwidth = TokenBucket(limit_mb * 1048576) if limit_mb > 0 else None
+        self.mirrors = {base.rstrip("/"): [m.rstrip("/") for m in alts] for base, alts in (mirrors or {}).items()}
+
+    def candidate_urls(self, url: str) -> list[str]:
+        """La URL original seguida de la misma ruta en cada espejo configurado para su prefijo."""
+        for base, alternatives in self.mirrors.items():
+            if url.startswith(base + "/"):
+                return [url] + [alt + url[len(base):] for alt in alternatives]
+        return [url]
+
+    def _pick_url(self, candidates: list[str]) -> str:
+        # El origen con menos fallos seguidos; a igualdad, el primero (el original)
+        return min(candidates, key=lambda u: self._failures.get(urllib.parse.urlparse(u).netloc, 0))
+
+    def _record(self, host: str, ok: bool) -> None:
+        with self._session_lock:
+            self._failures[host] = 0 if ok else self._failures.get(host, 0) + 1
+
+    def _backoff(self, candidates: list[str], attempt: int) -> None:
+        """Espera antes de reintentar solo si no queda ningún origen sin fallos recientes."""
+        if all(self._failures.get(urllib.parse.urlparse(u).netloc, 0) for u in candidates):
+            delay = min(DOWNLOAD_BACKOFF * 2 ** (attempt - 1), DOWNLOAD_BACKOFF_MAX)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _dest_lock(self, dest: str) -> threading.Lock:
+        """
+        Cerrojo por archivo de destino: lotes concurrentes (p. ej. dos versiones que comparten
+        librerías) no escriben a la vez el mismo .part; el segundo ve el archivo ya verificado.
+        """
+        with self._session_lock:
+            return self._dest_locks.setdefault(os.path.abspath(dest), threading.Lock())
+
+    @property
+    def session(self) -> requests.Session:
+        """Sesión HTTP compartida; se crea en el primer uso para no importar requests al arrancar."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_workers,
+                                                            pool_maxsize=self.scheduler.host_limit,
+                                                            pool_block=True)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def run(self, jobs: list[DownloadJob],
+            on_progress: Optional[Callable[[DownloadProgress], None]] = None) -> list[DownloadResult]:
+        """
+        Descarga el lote de trabajos con un pool acotado de hilos y devuelve los resultados
+        en el mismo orden. on_progress recibe el progreso agregado (desde hilos de trabajo).
+        """
+        lock = threading.Lock()
+        store_used: list[tuple[str, int]] = []  # Objetos del almacén enlazados o añadidos en el lote
+        store_added: list[tuple[str, int]] = []
+        # Los tamaños conocidos de antemano se suman ya, para que el ETA sea útil desde el principio
+        known_total = sum(job.size for job in jobs if job.size)
+        state = {"files_done": 0, "bytes_done": 0, "bytes_total": known_total, "last_report": 0.0}
+        start = time.monotonic()
+
+        def report(force: bool = False) -> None:
+            if on_progress is None:
+                return
+            now = time.monotonic()
+            with lock:
+                if not force and now - state["last_report"] < DOWNLOAD_PROGRESS_INTERVAL:
+                    return
+                state["last_report"] = now
+                elapsed = max(now - start, 1e-6)
+                progress = DownloadProgress(state["files_done"], len(jobs), state["bytes_done"],
+                                            state["bytes_total"], state["bytes_done"] / elapsed)
+            on_progress(progress)
+
+        def add_bytes(key: str, amount: int) -> None:
+            with lock:
+                state[key] += amount
+            report()
+
+        def worker(job: DownloadJob) -> DownloadResult:
+            with TRACER.span("download", file=job.name, priority=job.priority) as span, \
+                    self._dest_lock(job.dest):
+                try:
+                    if job.is_complete():
+                        logging.info(f"{job.name} ya está descargado y verificado, se omite")
+                        result = DownloadResult(job, True, skipped=True)
+                        add_bytes("bytes_total", -(job.size or 0))
+                    elif self.store and job.sha1 and self.store.fetch(job.sha1, job.dest, job.size, store_used):
+                        result = DownloadResult(job, True, skipped=True, from_store=True)
+                        add_bytes("bytes_total", -(job.size or 0))
+                    else:
+                        start_fetch = time.perf_counter()
+                        written = self._fetch(job, add_bytes, span)
+                        seconds = max(time.perf_counter() - start_fetch, 1e-6)
+                        span.set(bytes=written, bytes_per_sec=round(written / seconds))
+                        if self.store and job.sha1:
+                            self.store.add(job.dest, job.sha1, store_added)
+                        result = DownloadResult(job, True, written)
+                except Exception as e:
+                    logging.error(f"Error al descargar {job.name} desde {job.url}: {e}")
+                    result = DownloadResult(job, False, error=e)
+                    span.set(error=str(e))
+                span.set(skipped=result.skipped, from_store=result.from_store)
+            with lock:
+                state["files_done"] += 1
+            report(force=True)
+            return result
+
+        results: dict[int, DownloadResult] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(worker, job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        if self.store:
+            # Una sola transacción y una sola pasada de expulsión por lote, no una por archivo
+            self.store.record(store_used + store_added, evict=bool(store_added))
+        elapsed = time.monotonic() - start
+        total = state["bytes_done"]
+        logging.info(f"Descargados {len(jobs)} archivos ({total / 1048576:.1f} MiB) en {elapsed:.2f} s "
+                     f"({total / max(elapsed, 1e-6) / 1048576:.2f} MiB/s)")
+        # Sin el atributo "bytes": ya lo suman los spans de cada descarga
+        TRACER.record("download.batch", elapsed, files=len(jobs), total_bytes=total,
+                      failed=sum(not r.ok for r in results.values()))
+        return [results[i] for i in range(len(jobs))]
+
+    def get_json(self, url: str, priority: int = PRIORITY_LAUNCH):
+        """Descarga un JSON pequeño en memoria con los mismos espejos, reintentos y planificador."""
+        candidates = self.candidate_urls(url)
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            source = self._pick_url(candidates)
+            host = urllib.parse.urlparse(source).netloc
+            self.scheduler.acquire(host, priority)
+            try:
+                r = self.session.get(source, timeout=DOWNLOAD_TIMEOUT)
+                r.raise_for_status()
+                data = r.json()
+                self._record(host, True)
+                return data
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                self._record(host, False)
+                if attempt == DOWNLOAD_ATTEMPTS or not self._retryable(e, candidates):
+                    raise
+                logging.warning(f"No se pudo obtener {source} ({e}); reintentando (intento {attempt + 1})")
+            finally:
+                self.scheduler.release(host)
+            self._backoff(candidates, attempt)
+
+    @staticmethod
+    def _retryable(error: Exception, candidates: list[str]) -> bool:
+        """Los errores de red, 429 y 5xx se reintentan; otros errores HTTP solo si hay otro espejo."""
+        response = getattr(error, "response", None)
+        if not isinstance(error, requests.HTTPError) or response is None:
+            return True
+        return response.status_code == 429 or response.status_code >= 500 or len(candidates) > 1
+
+    def _fetch(self, job: DownloadJob, add_bytes: Callable[[str, int], None], span=NO_SPAN) -> int:
+        """
+        Descarga un archivo en <destino>.part con escrituras en bloques grandes y lo renombra
+        atómicamente al terminar, de modo que nunca quede un archivo truncado con el nombre final.
+        Si la conexión se corta, se reanuda con una petición Range desde lo ya escrito.
+        Cada intento ocupa un hueco del planificador; tras un fallo se prueba el espejo con menos
+        fallos y, si todos han fallado, se espera con backoff exponencial.
+        Devuelve los bytes transferidos por la red.
+        """
+        os.makedirs(os.path.dirname(job.dest), exist_ok=True)
+        part = job.dest + PART_SUFFIX
+        transferred = 0
+        counted = 0  # Bytes de este archivo ya sumados al progreso agregado
+        announced = job.size is not None  # Si el tamaño se conocía, ya está en el total del lote
+        candidates = self.candidate_urls(job.url)
+        # Con límite de ancho de banda se lee en bloques pequeños para repartirlo de forma regular
+        read_size = self.chunk_size if not self.bandwidth else \
+            max(16384, min(self.chunk_size, int(self.bandwidth.rate / 20)))
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            source = self._pick_url(candidates)
+            host = urllib.parse.urlparse(source).netloc
+            span.set(host=host, retries=attempt - 1)
+            self.scheduler.acquire(host, job.priority)
+            try:
+                with self.session.get(source, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as r:
+                    if r.status_code == 416 and offset:
+                        # El .part ya contiene el archivo completo (o está corrupto): se valida abajo
+                        break
+                    r.raise_for_status()
+                    if offset and r.status_code != 206:
+                        # El servidor ignoró el Range: se empieza de cero
+                        offset = 0
+                    if not announced:
+                        length = int(r.headers.get("content-length") or 0)
+                        add_bytes("bytes_total", offset + length if length else 0)
+                        announced = True
+                    if offset == 0 and counted:
+                        add_bytes("bytes_done", -counted)
+                        counted = 0
+                    if offset and not counted:
+                        add_bytes("bytes_done", offset)
+                        counted = offset
+                    with open(part, "ab" if offset else "wb", buffering=self.chunk_size) as f:
+                        for chunk in r.iter_content(chunk_size=read_size):
+                            if chunk:
+                                if self.bandwidth:
+                                    self.bandwidth.consume(len(chunk))
+                                f.write(chunk)
+                                transferred += len(chunk)
+                                counted += len(chunk)
+                                add_bytes("bytes_done", len(chunk))
+                self._record(host, True)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                self._record(host, False)
+                if attempt == DOWNLOAD_ATTEMPTS or not self._retryable(e, candidates):
+                    raise
+                logging.warning(f"Descarga de {job.name} desde {host} interrumpida ({e}); "
+                                f"reanudando (intento {attempt + 1})")
+            finally:
+                self.scheduler.release(host)
+            self._backoff(candidates, attempt)
+        problem = job.mismatch(part)
+        if problem:
+            os.remove(part)
+            raise ValueError(f"Verificación fallida para {job.name}: {problem}")
+        os.replace(part, job.dest)
+        return transferred
+
+
+def modrinth_file_info(session: requests.Session, url: str) -> Optional[dict]:
+    """
+    Consulta en la API de Modrinth el tamaño y los hashes publicados para una URL del CDN
+    (https://cdn.modrinth.com/data/<proyecto>/versions/<versión>/<archivo>).
+    Devuelve {"size": int, "sha1": str, "sha512": str} o None si no se puede obtener.
+    """
+    parts = urllib.parse.urlparse(url).path.strip("/").split("/")
+    if urllib.parse.urlparse(url).netloc != "cdn.modrinth.com" or len(parts) < 5 or parts[2] != "versions":
+        return None
+    try:
+        r = session.get(f"{MODRINTH_API}/version/{parts[3]}", timeout=DOWNLOAD_TIMEOUT)
+        r.raise_for_status()
+        filename = filename_from_url(url)
+        for file_info in r.json().get("files", []):
+            if file_info.get("url") == url or file_info.get("filename") == filename:
+                hashes = file_info.get("hashes", {})
+                return {"size": file_info.get("size"), "sha1": hashes.get("sha1"), "sha512": hashes.get("sha512")}
+    except Exception as e:
+        logging.warning(f"No se pudieron obtener los hashes de Modrinth para {url}: {e}")
+    return None
+
+
+def fill_modrinth_checksums(session: requests.Session, jobs: list[DownloadJob]) -> None:
+    """Completa size/sha1/sha512 de los trabajos que apuntan al CDN de Modrinth y aún no los tienen."""
+    pending = [job for job in jobs if not job.has_checksum()]
+    if not pending:
+        return
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        infos = list(pool.map(lambda job: modrinth_file_info(session, job.url), pending))
+    for job, info in zip(pending, infos):
+        if info:
+            job.size = info["size"]
+            job.sha1 = info["sha1"]
+            job.sha512 = info["sha512"]
+
+
+def default_store_dir() -> str:
+    """Carpeta del almacén de artefactos compartido por todas las copias del launcher del usuario."""
+    if os.environ.get("MNCKA_STORE_DIR"):
+        return os.environ["MNCKA_STORE_DIR"]
+    if platform.system() == "Windows":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, "MNC_KA", "store")
+    if platform.system() == "Darwin":
+        return os.path.expanduser("~/Library/Caches/MNC_KA/store")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "mnc_ka", "store")
+
+
+def clone_file(src: str, dst: str) -> None:
+    """
+    Materializa src en dst sin duplicar datos cuando es posible: hardlink, luego reflink
+    (Linux, btrfs/xfs) y, como último recurso, una copia normal.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # Temporal propio del hilo: dos instancias pueden materializar el mismo objeto a la vez
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}{PART_SUFFIX}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        try:
+            if platform.system() != "Linux":
+                raise OSError("reflink no disponible")
+            import fcntl
+            with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ArtifactStore:
+    """
+    Almacén de artefactos direccionado por contenido (SHA-1), compartido por todas las copias
+    del launcher de la máquina. Los objetos se guardan en objects/<xx>/<sha1> y cada instancia
+    los enlaza (hardlink/reflink) en sus carpetas libraries/, assets/objects y mods/.
+    El uso se registra en una base SQLite (segura entre procesos) para expulsar por LRU
+    cuando el tamaño total supera max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = STORE_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.db_path = os.path.join(root, "index.sqlite3")
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS objects "
+                       "(sha1 TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+
+    @classmethod
+    def default(cls) -> Optional["ArtifactStore"]:
+        """Crea el almacén en la carpeta por defecto; devuelve None si no se puede usar."""
+        try:
+            return cls(default_store_dir())
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Almacén de artefactos compartido no disponible: {e}")
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def path_for(self, sha1: str) -> str:
+        sha1 = sha1.lower()
+        return os.path.join(self.root, "objects", sha1[:2], sha1)
+
+    def record(self, entries: list[tuple[str, int]], evict: bool = False) -> None:
+        """
+        Registra el uso de un lote de objetos (sha1, tamaño) en una sola transacción y, si se
+        pide (porque el lote añadió objetos), aplica el límite de tamaño una vez para todo el lote.
+        """
+        if entries:
+            now = time.time()
+            with self._connect() as db:
+                db.executemany("INSERT INTO objects (sha1, size, last_used) VALUES (?, ?, ?) "
+                               "ON CONFLICT(sha1) DO UPDATE SET last_used = excluded.last_used",
+                               [(sha1.lower(), size, now) for sha1, size in entries])
+        if evict:
+            self.evict()
+
+    def fetch(self, sha1: str, dest: str, size: Optional[int] = None,
+              pending: Optional[list[tuple[str, int]]] = None) -> bool:
+        """
+        Enlaza el objeto sha1 en dest si está en el almacén. Devuelve True si lo consiguió.
+        Con pending, el uso se añade a esa lista para registrarlo después con record().
+        """
+        obj = self.path_for(sha1)
+        try:
+            obj_size = os.path.getsize(obj)
+            if size is not None and obj_size != size:
+                return False
+            clone_file(obj, dest)
+        except OSError:
+            return False
+        if pending is None:
+            self.record([(sha1, obj_size)])
+        else:
+            pending.append((sha1, obj_size))
+        return True
+
+    def add(self, path: str, sha1: str, pending: Optional[list[tuple[str, int]]] = None) -> bool:
+        """
+        Incorpora un archivo ya verificado al almacén. Si el objeto ya existía y es correcto, path
+        se sustituye por un enlace al objeto para no ocupar el espacio dos veces; si está dañado,
+        se descarta y path pasa a ser el nuevo objeto. Con pending, el uso se añade a esa lista y
+        quien llama hace record(pending, evict=True) al terminar el lote.
+        """
+        obj = self.path_for(sha1)
+        try:
+            if os.path.exists(obj) and not os.path.samefile(obj, path):
+                if os.path.getsize(obj) == os.path.getsize(path) and file_hash(obj, "sha1") == sha1.lower():
+                    clone_file(obj, path)
+                else:
+                    logging.warning(f"Objeto {sha1} dañado en el almacén; se sustituye por {path}")
+                    self.discard(sha1)
+            if not os.path.exists(obj):
+                clone_file(path, obj)
+            entry = (sha1, os.path.getsize(obj))
+        except OSError as e:
+            logging.warning(f"No se pudo añadir {path} al almacén: {e}")
+            return False
+        if pending is None:
+            self.record([entry], evict=True)
+        else:
+            pending.append(entry)
+        return True
+
+    def evict(self) -> None:
+        """Elimina los objetos usados hace más tiempo hasta quedar por debajo del 90% del límite."""
+        with self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = self.max_bytes * 0.9
+            removed = []
+            for sha1, size in db.execute("SELECT sha1, size FROM objects ORDER BY last_used").fetchall():
+                if total <= target:
+                    break
+                try:
+                    os.remove(self.path_for(sha1))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"No se pudo expulsar {sha1} del almacén: {e}")
+                    continue
+                removed.append((sha1,))
+                total -= size
+            db.executemany("DELETE FROM objects WHERE sha1 = ?", removed)
+        logging.info(f"Almacén de artefactos: expulsados {len(removed)} objetos por LRU")
+
+    def discard(self, sha1: str) -> None:
+        """Elimina un objeto del almacén (p. ej. porque se detectó dañado a través de un hardlink)."""
+        try:
+            os.remove(self.path_for(sha1))
+        except FileNotFoundError:
+            pass
+        with self._connect() as db:
+            db.execute("DELETE FROM objects WHERE sha1 = ?", (sha1.lower(),))
+
+    def populate(self, files: list["VersionFile"]) -> int:
+        """Enlaza desde el almacén los archivos que falten en la instancia. Devuelve cuántos se enlazaron."""
+        pending: list[tuple[str, int]] = []
+        for vf in files:
+            if vf.sha1 and not os.path.exists(vf.path):
+                self.fetch(vf.sha1, vf.path, vf.size, pending)
+        self.record(pending)
+        return len(pending)
+
+    def ingest(self, files: list["VersionFile"]) -> int:
+        """Incorpora al almacén los archivos de la instancia que aún no estén. Devuelve cuántos se añadieron."""
+        pending: list[tuple[str, int]] = []
+        for vf in files:
+            if not vf.sha1 or not os.path.isfile(vf.path):
+                continue
+            obj = self.path_for(vf.sha1)
+            if os.path.exists(obj) and os.path.samefile(obj, vf.path):
+                continue
+            if file_hash(vf.path, "sha1") != vf.sha1.lower():
+                continue  # Nunca se guarda en el almacén un archivo corrupto
+            self.add(vf.path, vf.sha1, pending)
+        self.record(pending, evict=bool(pending))
+        return len(pending)
+
+
+@dataclass
+class VersionFile:
+    """Un archivo que necesita una versión instalada: ruta absoluta, URL y hash esperado."""
+    path: str
+    url: Optional[str]
+    sha1: Optional[str] = None
+    size: Optional[int] = None
+
+
+def os_name() -> str:
+    """Nombre del sistema operativo tal como aparece en las reglas de los JSON de versión."""
+    return {"Windows": "windows", "Darwin": "osx"}.get(platform.system(), "linux")
+
+
+def rules_allow(rules: Optional[list]) -> bool:
+    """Evalúa las reglas de sistema operativo de una librería o argumento (sin 'features')."""
+    if not rules:
+        return True
+    allowed = False
+    for rule in rules:
+        if rule.get("features"):
+            continue
+        os_rule = rule.get("os", {})
+        if os_rule.get("name") and os_rule["name"] != os_name():
+            continue
+        allowed = rule.get("action") == "allow"
+    return allowed
+
+
+def maven_path(name: str) -> str:
+    """Ruta relativa dentro de libraries/ para una coordenada Maven grupo:artefacto:versión[:clasificador]."""
+    parts = name.split(":")
+    group, artifact, version = parts[:3]
+    classifier = f"-{parts[3]}" if len(parts) > 3 else ""
+    return "/".join(group.split(".") + [artifact, version, f"{artifact}-{version}{classifier}.jar"])
+
+
+def load_version_json(minecraft_dir: str, version_id: str) -> dict:
+    with open(os.path.join(minecraft_dir, "versions", version_id, f"{version_id}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def version_chain(minecraft_dir: str, version_id: str) -> list[dict]:
+    """JSON de la versión y de todas las que hereda (inheritsFrom), de hija a padre."""
+    chain = []
+    while version_id:
+        data = load_version_json(minecraft_dir, version_id)
+        chain.append(data)
+        version_id = data.get("inheritsFrom")
+    return chain
+
+
+def library_files(minecraft_dir: str, libraries: list[dict]) -> list[VersionFile]:
+    """Artefactos y nativos del sistema actual de una lista de librerías de un JSON de versión."""
+    libs_dir = os.path.join(minecraft_dir, "libraries")
+    files = []
+    for lib in libraries:
+        if not rules_allow(lib.get("rules")):
+            continue
+        downloads = lib.get("downloads", {})
+        artifact = downloads.get("artifact")
+        if artifact and artifact.get("path"):
+            files.append(VersionFile(os.path.join(libs_dir, artifact["path"]), artifact.get("url") or None,
+                                     artifact.get("sha1"), artifact.get("size")))
+        elif not downloads and "name" in lib:
+            # Formato Maven (Fabric): solo nombre y repositorio base
+            path = maven_path(lib["name"])
+            base = lib.get("url", "https://libraries.minecraft.net/")
+            files.append(VersionFile(os.path.join(libs_dir, path), base.rstrip("/") + "/" + path,
+                                     lib.get("sha1"), lib.get("size")))
+        native_key = lib.get("natives", {}).get(os_name())
+        if native_key:
+            arch = "64" if sys.maxsize > 2 ** 32 else "32"
+            native = downloads.get("classifiers", {}).get(native_key.replace("${arch}", arch))
+            if native:
+                files.append(VersionFile(os.path.join(libs_dir, native["path"]), native.get("url"),
+                                         native.get("sha1"), native.get("size")))
+    return files
+
+
+def asset_files(minecraft_dir: str, asset_index: dict) -> list[VersionFile]:
+    """Objetos de assets (direccionados por su SHA-1) listados en un índice de assets."""
+    objects_dir = os.path.join(minecraft_dir, "assets", "objects")
+    files = []
+    for obj in asset_index.get("objects", {}).values():
+        h = obj["hash"]
+        files.append(VersionFile(os.path.join(objects_dir, h[:2], h), f"{ASSET_OBJECTS_URL}/{h[:2]}/{h}",
+                                 h, obj.get("size")))
+    return files
+
+
+def version_files(minecraft_dir: str, version_id: str) -> list[VersionFile]:
+    """
+    Todos los archivos descargables de una versión instalada (y de las que hereda): jar del
+    cliente, índice de assets, librerías, nativos y objetos de assets.
+    """
+    chain = version_chain(minecraft_dir, version_id)
+    files: list[VersionFile] = []
+    for data in chain:
+        client = data.get("downloads", {}).get("client")
+        if client:
+            files.append(VersionFile(os.path.join(minecraft_dir, "versions", data["id"], f"{data['id']}.jar"),
+                                     client.get("url"), client.get("sha1"), client.get("size")))
+        files.extend(library_files(minecraft_dir, data.get("libraries", [])))
+        log_file = data.get("logging", {}).get("client", {}).get("file")
+        if log_file:
+            files.append(VersionFile(os.path.join(minecraft_dir, "assets", "log_configs", log_file["id"]),
+                                     log_file.get("url"), log_file.get("sha1"), log_file.get("size")))
+    asset_index = next((data["assetIndex"] for data in chain if "assetIndex" in data), None)
+    if asset_index:
+        index_path = os.path.join(minecraft_dir, "assets", "indexes", f"{asset_index['id']}.json")
+        files.append(VersionFile(index_path, asset_index.get("url"), asset_index.get("sha1"), asset_index.get("size")))
+        if os.path.isfile(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                files.extend(asset_files(minecraft_dir, json.load(f)))
+    return files
+
+
+@dataclass
+class InstallEvent:
+    """Evento de progreso de una instalación (se emite desde hilos de trabajo)."""
+    phase: str
+    files_done: int = 0
+    files_total: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0
+    bytes_per_sec: float = 0.0
+    eta: Optional[float] = None  # Segundos restantes estimados
+
+    @property
+    def percent(self) -> float:
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total * 100, 100)
+        if self.files_total:
+            return self.files_done / self.files_total * 100
+        return 0
+
+    def describe(self) -> str:
+        text = f"{self.phase}: {self.files_done}/{self.files_total} archivos"
+        if self.bytes_per_sec:
+            text += f", {self.bytes_per_sec / 1048576:.2f} MiB/s"
+        if self.eta is not None:
+            text += f", quedan {int(self.eta) // 60}:{int(self.eta) % 60:02d}"
+        return text
+
+
+def _missing(vf: VersionFile) -> bool:
+    """Un archivo falta si no existe o su tamaño no coincide (la verificación completa es aparte)."""
+    try:
+        return vf.size is not None and os.path.getsize(vf.path) != vf.size
+    except OSError:
+        return True
+
+
+def install_version(minecraft_dir: str, version_id: str, engine: DownloadEngine,
+                    on_event: Optional[Callable[[InstallEvent], None]] = None,
+                    finalize_lock: Optional[threading.Lock] = None) -> None:
+    """
+    Instala una versión vanilla descargando todo a través del pool del motor de descargas:
+    primero resuelve el JSON de la versión y el índice de assets, enlaza lo que ya esté en el
+    almacén compartido del motor, luego baja en un único lote concurrente el jar del cliente,
+    librerías, nativos y objetos de assets que falten, y por
+    último deja que minecraft_launcher_lib complete los pasos locales (nativos, runtime de Java).
+    Si se instalan varias versiones a la vez, finalize_lock serializa esos pasos locales, que
+    escriben en el mismo runtime de Java.
+    """
+    emit = on_event or (lambda event: None)
+    json_path = os.path.join(minecraft_dir, "versions", version_id, f"{version_id}.json")
+    if not os.path.isfile(json_path):
+        emit(InstallEvent("Resolviendo versión"))
+        manifest = engine.get_json(VERSION_MANIFEST_URL)
+        entry = next((v for v in manifest["versions"] if v["id"] == version_id), None)
+        if entry is None:
+            raise minecraft_launcher_lib.exceptions.VersionNotFound(version_id)
+        result = engine.run([DownloadJob(f"{version_id}.json", entry["url"], json_path, sha1=entry.get("sha1"))])[0]
+        if not result.ok:
+            raise result.error
+
+    # El índice de assets se necesita antes de poder listar los objetos
+    chain = version_chain(minecraft_dir, version_id)
+    asset_index = next((data["assetIndex"] for data in chain if "assetIndex" in data), None)
+    if asset_index:
+        index_path = os.path.join(minecraft_dir, "assets", "indexes", f"{asset_index['id']}.json")
+        index_file = VersionFile(index_path, asset_index["url"], asset_index.get("sha1"), asset_index.get("size"))
+        if _missing(index_file):
+            result = engine.run([DownloadJob(os.path.basename(index_path), index_file.url, index_path,
+                                             index_file.size, index_file.sha1)])[0]
+            if not result.ok:
+                raise result.error
+
+    files = version_files(minecraft_dir, version_id)
+    if engine.store:
+        # Ya con el JSON en disco: lo que otra instancia tenga en el almacén se enlaza sin descargar
+        linked = engine.store.populate(files)
+        logging.info(f"{version_id}: {linked} archivos enlazados desde el almacén compartido")
+    seen = set()
+    jobs = []
+    for vf in files:
+        if vf.url and vf.path not in seen and _missing(vf):
+            seen.add(vf.path)
+            jobs.append(DownloadJob(os.path.basename(vf.path), vf.url, vf.path, vf.size, vf.sha1))
+    logging.info(f"{version_id}: {len(files) - len(jobs)} archivos ya presentes, {len(jobs)} por descargar")
+
+    def on_progress(p: DownloadProgress) -> None:
+        remaining = p.bytes_total - p.bytes_done
+        eta = remaining / p.bytes_per_sec if p.bytes_per_sec and p.bytes_total else None
+        emit(InstallEvent("Descargando archivos", p.files_done, p.files_total, p.bytes_done,
+                          p.bytes_total, p.bytes_per_sec, eta))
+
+    with TRACER.span("install.download", version=version_id, files=len(files), missing=len(jobs)):
+        failed = [r for r in engine.run(jobs, on_progress) if not r.ok]
+    if failed:
+        raise RuntimeError(f"No se pudieron descargar {len(failed)} archivos (p. ej. {failed[0].job.name}: {failed[0].error})")
+
+    # Pasos locales restantes: extracción de nativos y runtime de Java. Los archivos ya están,
+    # así que minecraft_launcher_lib solo los comprueba.
+    finalize = {"max": 0}
+
+    def set_max(value: int) -> None:
+        finalize["max"] = value
+
+    callback = {
+        "setStatus": lambda text: emit(InstallEvent(f"Finalizando ({text})")),
+        "setMax": set_max,
+        "setProgress": lambda value: emit(InstallEvent("Finalizando", value, finalize["max"])),
+    }
+    with TRACER.span("install.finalize", version=version_id), finalize_lock or contextlib.nullcontext():
+        minecraft_launcher_lib.install.install_minecraft_version(version_id, minecraft_dir, callback=callback)
+    emit(InstallEvent("Instalación completa", len(jobs), len(jobs)))
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Escribe un JSON en un temporal y lo renombra, para no dejar nunca un archivo a medias."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class InstalledIndex:
+    """
+    Índice persistente (launcher_index.json) de las versiones instaladas, los loaders de Fabric,
+    los mods y las marcas mods_installed_<ver>.txt de una carpeta de Minecraft.
+    Se actualiza de forma incremental: solo se vuelve a leer el JSON de una versión cuando cambian
+    su mtime o tamaño, y la carpeta mods/ solo se vuelve a listar cuando cambia su mtime.
+    """
+
+    def __init__(self, minecraft_dir: str) -> None:
+        self.minecraft_dir = minecraft_dir
+        self.path = os.path.join(minecraft_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self.data: dict = {"versions": {}, "mods_mtime_ns": 0, "mods": [], "markers": []}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        except (OSError, ValueError):
+            pass  # Sin índice previo (o dañado): se reconstruye en refresh()
+
+    def refresh(self) -> None:
+        """Sincroniza el índice con el disco y lo guarda si algo cambió."""
+        with self._lock:
+            changed = self._refresh_versions()
+            changed = self._refresh_mods() or changed
+            if changed:
+                try:
+                    write_json_atomic(self.path, self.data)
+                except OSError as e:
+                    logging.warning(f"No se pudo guardar el índice de versiones: {e}")
+
+    def _refresh_versions(self) -> bool:
+        versions_dir = os.path.join(self.minecraft_dir, "versions")
+        old = self.data["versions"]
+        new = {}
+        changed = False
+        try:
+            entries = [e for e in os.scandir(versions_dir) if e.is_dir()]
+        except OSError:
+            entries = []
+        for entry in entries:
+            json_path = os.path.join(entry.path, f"{entry.name}.json")
+            try:
+                st = os.stat(json_path)
+            except OSError:
+                continue
+            jar_present = os.path.exists(os.path.join(entry.path, f"{entry.name}.jar"))
+            cached = old.get(entry.name)
+            if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                if cached.get("jar") != jar_present:
+                    cached = dict(cached, jar=jar_present)
+                    changed = True
+                new[entry.name] = cached
+                continue
+            try:
+                with open(json_path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            new[entry.name] = {
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "type": data.get("type", "release"),
+                "releaseTime": data.get("releaseTime", ""),
+                "inheritsFrom": data.get("inheritsFrom"),
+                "jar": jar_present,
+            }
+            changed = True
+        if set(new) != set(old):
+            changed = True
+        self.data["versions"] = new
+        return changed
+
+    def _refresh_mods(self) -> bool:
+        mods_dir = os.path.join(self.minecraft_dir, "mods")
+        try:
+            mtime_ns = os.stat(mods_dir).st_mtime_ns
+        except OSError:
+            return False
+        if mtime_ns == self.data["mods_mtime_ns"]:
+            return False
+        names = os.listdir(mods_dir)
+        self.data["mods_mtime_ns"] = mtime_ns
+        self.data["mods"] = sorted(n for n in names if n.lower().endswith(".jar"))
+        self.data["markers"] = sorted(n[len("mods_installed_"):-len(".txt")] for n in names
+                                      if n.startswith("mods_installed_") and n.endswith(".txt"))
+        return True
+
+    def vanilla_versions(self) -> list[str]:
+        """Versiones base instaladas (con su jar), de la más reciente a la más antigua."""
+        versions = self.data["versions"]
+        ids = [v for v, info in versions.items() if not info.get("inheritsFrom") and info.get("jar")]
+        return sorted(ids, key=lambda v: versions[v].get("releaseTime", ""), reverse=True)
+
+    def fabric_versions(self) -> dict[str, str]:
+        """{versión vanilla: id del perfil fabric-loader} para los loaders instalados."""
+        result = {}
+        for ver_id in sorted(self.data["versions"]):
+            info = self.data["versions"][ver_id]
+            if ver_id.startswith("fabric-loader-") and info.get("inheritsFrom"):
+                result[info["inheritsFrom"]] = ver_id
+        return result
+
+    def has_marker(self, vanilla_ver: str) -> bool:
+        return vanilla_ver in self.data["markers"]
+
+    def mods(self) -> list[str]:
+        return list(self.data["mods"])
+
+
+def parse_mod_version(version: str) -> Optional[tuple[tuple, str]]:
+    """
+    Versión semántica al estilo de Fabric: "0.118.0+1.21.4" -> ((0, 118, 0), "").
+    Los componentes "x", "X" o "*" se devuelven como None (comodín). None si no es numérica
+    (p. ej. una snapshot "24w14a"), en cuyo caso no se puede comparar.
+    """
+    core, _, pre = version.split("+", 1)[0].partition("-")
+    parts = []
+    for piece in core.split("."):
+        if piece in ("x", "X", "*"):
+            parts.append(None)
+        elif piece.isdigit():
+            parts.append(int(piece))
+        else:
+            return None
+    return tuple(parts), pre
+
+
+def _compare_versions(a: tuple[tuple, str], b: tuple[tuple, str]) -> int:
+    length = max(len(a[0]), len(b[0]))
+    core_a = a[0] + (0,) * (length - len(a[0]))
+    core_b = b[0] + (0,) * (length - len(b[0]))
+    if core_a != core_b:
+        return -1 if core_a < core_b else 1
+    if a[1] == b[1]:
+        return 0
+    if not a[1] or not b[1]:
+        return -1 if a[1] else 1  # Una prerelease es anterior a la versión final
+    return -1 if a[1] < b[1] else 1
+
+
+def version_matches(version: str, predicate) -> bool:
+    """
+    Comprueba una versión contra un predicado de fabric.mod.json: "*", ">=1.21.2", "~1.21.4",
+    "^0.16", "1.21.x", varios términos separados por espacios (todos deben cumplirse) o una
+    lista de predicados (basta con uno). Lo que no se puede interpretar se da por bueno.
+    """
+    if isinstance(predicate, list):
+        return not predicate or any(version_matches(version, p) for p in predicate)
+    parsed = parse_mod_version(version)
+    if parsed is None or not isinstance(predicate, str):
+        return True
+    for term in predicate.split():
+        if term == "*":
+            continue
+        match = re.match(r"(>=|<=|>|<|=|~|\^)?(.+)$", term)
+        op, target = match.group(1) or "=", parse_mod_version(match.group(2))
+        if target is None:
+            continue
+        core = target[0]
+        if None in core:
+            # "1.21.x": coinciden los componentes anteriores al comodín
+            prefix = core[:core.index(None)]
+            if parsed[0][:len(prefix)] + (0,) * (len(prefix) - len(parsed[0])) != prefix:
+                return False
+            continue
+        cmp = _compare_versions(parsed, target)
+        if op == "=" and cmp != 0 or op == ">=" and cmp < 0 or op == "<=" and cmp > 0 \
+                or op == ">" and cmp <= 0 or op == "<" and cmp >= 0:
+            return False
+        if op in ("~", "^"):
+            # ~1.21.4 admite 1.21.*; ^0.16.2 admite 0.*.* (mismo primer componente)
+            keep = min(2, len(core)) if op == "~" else 1
+            if cmp < 0 or (parsed[0] + (0,) * keep)[:keep] != core[:keep]:
+                return False
+    return True
+
+
+@dataclass
+class ModInfo:
+    """Metadatos de un mod leídos de su fabric.mod.json (file es el jar de mods/ que lo contiene)."""
+    file: str
+    id: str
+    version: str
+    name: str = ""
+    depends: Optional[dict] = None
+    breaks: Optional[dict] = None
+    provides: Optional[list] = None
+    nested: bool = False
+
+    @property
+    def label(self) -> str:
+        return f"{self.name or self.id} {self.version}"
+
+
+def read_mod_metadata(source, file: str, depth: int = 0) -> list[ModInfo]:
+    """
+    Lee fabric.mod.json de un jar (ruta o archivo en memoria) y de los jars que anida.
+    ZipFile solo lee el directorio central y los miembros pedidos: no se extrae nada a disco.
+    """
+    with zipfile.ZipFile(source) as jar:
+        try:
+            raw = jar.read(MOD_METADATA)
+        except KeyError:
+            return []
+        data = json.loads(raw.decode("utf-8-sig"), strict=False)  # Hay mods con saltos de línea sin escapar
+        provides = data.get("provides") or []
+        mods = [ModInfo(file, data["id"], str(data.get("version", "")), data.get("name", ""),
+                        data.get("depends") or {}, data.get("breaks") or {},
+                        provides if isinstance(provides, list) else [], depth > 0)]
+        if depth < MOD_NESTING_DEPTH:
+            for entry in data.get("jars") or []:
+                try:
+                    inner = io.BytesIO(jar.read(entry["file"]))
+                    mods += read_mod_metadata(inner, file, depth + 1)
+                except (KeyError, TypeError, ValueError, zipfile.BadZipFile):
+                    continue
+        return mods
+
+
+class ModIndex:
+    """
+    Índice de los mods de la carpeta mods/ (cache/mods.json) con los metadatos de cada jar.
+    Como InstalledIndex, es incremental: un jar solo se vuelve a leer si cambian su mtime o tamaño.
+    Sustituye a adivinar por el nombre del archivo: las dependencias, incompatibilidades y la
+    versión de Minecraft se comprueban en una sola pasada con check().
+    """
+
+    def __init__(self, minecraft_dir: str) -> None:
+        self.mods_dir = os.path.join(minecraft_dir, "mods")
+        self.path = os.path.join(minecraft_dir, "cache", "mods.json")
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass  # Sin índice previo (o dañado): se reconstruye en refresh()
+
+    def refresh(self) -> list[ModInfo]:
+        """Sincroniza el índice con mods/ y devuelve los mods instalados (incluidos los anidados)."""
+        with self._lock:
+            try:
+                jars = [e for e in os.scandir(self.mods_dir) if e.is_file() and e.name.lower().endswith(".jar")]
+            except OSError:
+                jars = []
+            entries = {}
+            for entry in jars:
+                st = entry.stat()
+                cached = self.entries.get(entry.name)
+                if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+                    entries[entry.name] = cached
+                    continue
+                try:
+                    mods = [vars(m) for m in read_mod_metadata(entry.path, entry.name)]
+                    error = None
+                except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                    mods, error = [], str(e)
+                entries[entry.name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "mods": mods, "error": error}
+            if entries != self.entries:
+                self.entries = entries
+                try:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    write_json_atomic(self.path, entries)
+                except OSError as e:
+                    logging.warning(f"No se pudo guardar el índice de mods: {e}")
+            return [ModInfo(**m) for entry in self.entries.values() for m in entry["mods"]]
+
+    def has(self, mod_id: str) -> bool:
+        """True si algún jar de mods/ aporta ese id (directamente, por 'provides' o anidado)."""
+        return any(mod_id == m.id or mod_id in (m.provides or []) for m in self.refresh())
+
+    def check(self, minecraft_version: str, loader_version: Optional[str] = None,
+              java_major: Optional[int] = None) -> list[str]:
+        """Problemas de los mods instalados para esa versión del juego (lista vacía si no hay)."""
+        mods = self.refresh()
+        problems = []
+        for name, entry in sorted(self.entries.items()):
+            if entry.get("error"):
+                problems.append(f"{name} está dañado: {entry['error']}")
+            elif not entry["mods"]:
+                problems.append(f"{name} no es un mod de Fabric (no tiene {MOD_METADATA})")
+        available: dict[str, list[str]] = {"minecraft": [minecraft_version]}
+        if loader_version:
+            available["fabricloader"] = [loader_version]
+        if java_major:
+            available["java"] = [str(java_major)]
+        owners: dict[str, list[ModInfo]] = {}
+        for mod in mods:
+            for mod_id in [mod.id] + list(mod.provides or []):
+                available.setdefault(mod_id, []).append(mod.version)
+            if not mod.nested:
+                owners.setdefault(mod.id, []).append(mod)
+        for mod_id, copies in sorted(owners.items()):
+            if len(copies) > 1:
+                problems.append(f"{mod_id} está instalado varias veces: {', '.join(sorted(m.file for m in copies))}")
+        for mod in mods:
+            for dep, predicate in (mod.depends or {}).items():
+                if dep not in available:
+                    if dep in ("fabricloader", "java"):
+                        continue  # No se conoce la versión del loader o de Java: no se puede comprobar
+                    problems.append(f"{mod.label} requiere {dep} ({predicate}), que no está instalado")
+                elif not any(version_matches(v, predicate) for v in available[dep]):
+                    problems.append(f"{mod.label} requiere {dep} {predicate}; "
+                                    f"está instalado {', '.join(available[dep])}")
+            for dep, predicate in (mod.breaks or {}).items():
+                if any(version_matches(v, predicate) for v in available.get(dep, [])):
+                    problems.append(f"{mod.label} es incompatible con {dep} {', '.join(available[dep])}")
+        return problems
+
+
+def fabric_version_parts(version_id: str, vanilla: str) -> tuple[str, str]:
+    """(versión de Minecraft, versión del loader) de un perfil fabric-loader-<loader>-<vanilla>."""
+    loader = version_id[len("fabric-loader-"):]
+    if loader.endswith(f"-{vanilla}"):
+        loader = loader[:-len(vanilla) - 1]
+    return vanilla, loader
+
+
+class LaunchCommandCache:
+    """
+    Caché de comandos de lanzamiento ya resueltos, por versión (cache/commands/<versión>.json).
+    get_minecraft_command lee y fusiona los JSON heredados, recorre todas las librerías para el
+    classpath y evalúa reglas; aquí se hace una sola vez con marcadores en lugar del usuario,
+    UUID, token y argumentos de la JVM, y en cada lanzamiento solo se rellenan esos huecos.
+    La plantilla se invalida si cambia algún JSON de la cadena de herencia (mtime/tamaño y,
+    si estos cambian, su SHA-1), las opciones fijas, o si falta algún jar del classpath.
+    """
+
+    def __init__(self, minecraft_dir: str) -> None:
+        self.minecraft_dir = minecraft_dir
+        self.cache_dir = os.path.join(minecraft_dir, "cache", "commands")
+        self._lock = threading.Lock()
+
+    def _entry_path(self, version_id: str) -> str:
+        return os.path.join(self.cache_dir, version_id.replace(os.sep, "_") + ".json")
+
+    def _chain_files(self, version_id: str) -> list[str]:
+        paths = []
+        while version_id:
+            path = os.path.join(self.minecraft_dir, "versions", version_id, f"{version_id}.json")
+            paths.append(path)
+            with open(path, encoding="utf-8") as f:
+                version_id = json.load(f).get("inheritsFrom")
+        return paths
+
+    @staticmethod
+    def _stats(paths: list[str]) -> list[list]:
+        result = []
+        for path in paths:
+            st = os.stat(path)
+            result.append([path, st.st_mtime_ns, st.st_size])
+        return result
+
+    @staticmethod
+    def _digest(paths: list[str]) -> str:
+        h = hashlib.sha1()
+        for path in paths:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    @staticmethod
+    def _fixed_options(options: dict) -> str:
+        fixed = {k: v for k, v in options.items() if k not in LAUNCH_PLACEHOLDERS and k != "jvmArguments"}
+        return json.dumps(fixed, sort_keys=True)
+
+    @staticmethod
+    def classpath(command: list[str]) -> list[str]:
+        for flag in ("-cp", "-classpath"):
+            if flag in command[:-1]:
+                return [p for p in command[command.index(flag) + 1].split(os.pathsep) if p]
+        return []
+
+    def _valid(self, entry: dict, options: dict) -> bool:
+        """Comprobación rápida: stat de los JSON y existencia del classpath y del ejecutable de Java."""
+        if entry.get("options") != self._fixed_options(options):
+            return False
+        paths = [path for path, _, _ in entry["files"]]
+        try:
+            stats = self._stats(paths)
+        except OSError:
+            return False
+        if stats != entry["files"]:
+            # mtime distinto no implica contenido distinto (p. ej. reinstalación): se compara el hash
+            try:
+                if self._digest(paths) != entry["sha1"]:
+                    return False
+            except OSError:
+                return False
+            entry["files"] = stats
+            self._save(entry)
+        java = entry["command"][0]
+        if os.path.isabs(java) and not os.path.exists(java):
+            return False
+        return all(os.path.exists(p) for p in self.classpath(entry["command"]))
+
+    def _save(self, entry: dict) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_json_atomic(self._entry_path(entry["version"]), entry)
+        except OSError as e:
+            logging.warning(f"No se pudo guardar la plantilla de lanzamiento de {entry['version']}: {e}")
+
+    def template(self, version_id: str, options: dict) -> list[str]:
+        """Devuelve la plantilla de comando de la versión, resolviéndola de nuevo solo si es necesario."""
+        with self._lock, TRACER.span("command.template", version=version_id) as span:
+            try:
+                with open(self._entry_path(version_id), encoding="utf-8") as f:
+                    entry = json.load(f)
+                if self._valid(entry, options):
+                    span.set(cached=True)
+                    return entry["command"]
+            except (OSError, ValueError, KeyError, IndexError):
+                pass
+            span.set(cached=False)
+            logging.info(f"Resolviendo el comando de lanzamiento de {version_id}")
+            paths = self._chain_files(version_id)
+            stats = self._stats(paths)
+            resolve_options = dict(options, jvmArguments=[JVM_ARGS_PLACEHOLDER], **LAUNCH_PLACEHOLDERS)
+            command = minecraft_launcher_lib.command.get_minecraft_command(version_id, self.minecraft_dir,
+                                                                           resolve_options)
+            entry = {"version": version_id, "files": stats, "sha1": self._digest(paths),
+                     "options": self._fixed_options(options), "command": command}
+            self._save(entry)
+            return command
+
+    def get(self, version_id: str, options: dict) -> list[str]:
+        """Comando listo para ejecutar: la plantilla con usuario, UUID, token y argumentos JVM rellenados."""
+        command = []
+        for arg in self.template(version_id, options):
+            if arg == JVM_ARGS_PLACEHOLDER:
+                command.extend(options.get("jvmArguments", []))
+                continue
+            for key, placeholder in LAUNCH_PLACEHOLDERS.items():
+                arg = arg.replace(placeholder, options.get(key, ""))
+            command.append(arg)
+        return command
+
+
+class ClassDataSharing:
+    """
+    Archivos AppCDS (cache/cds) para acelerar la carga de clases del juego: uno por versión,
+    conjunto de mods y Java. Si cambia alguno, la clave cambia y el archivo se genera de nuevo
+    en la siguiente partida (al salir del juego); los de claves anteriores se borran.
+    Desde Java 19 la JVM valida y regenera el archivo por sí misma (AutoCreateSharedArchive).
+    """
+
+    def __init__(self, minecraft_dir: str) -> None:
+        self.cache_dir = os.path.join(minecraft_dir, "cache", "cds")
+
+    @staticmethod
+    def key(version_id: str, mods: dict[str, dict], java: str, java_major: int) -> str:
+        """Clave del archivo: versión, jars de mods (nombre, tamaño y mtime) y ejecutable de Java."""
+        parts = [version_id, java, str(java_major)]
+        parts += [f"{name}:{entry['size']}:{entry['mtime_ns']}" for name, entry in sorted(mods.items())]
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def jvm_arguments(self, version_id: str, mods: dict[str, dict], java: str,
+                      java_major: Optional[int]) -> tuple[list[str], Optional[str]]:
+        """
+        Argumentos de CDS para la JVM y el modo: "use" si el archivo ya existe, "create" si se
+        generará al salir del juego, o None si esta versión de Java no admite archivos dinámicos.
+        """
+        if java_major is None or java_major < CDS_MIN_JAVA:
+            return [], None
+        prefix = version_id.replace(os.sep, "_") + "-"
+        path = os.path.join(self.cache_dir, f"{prefix}{self.key(version_id, mods, java, java_major)}.jsa")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Solo los archivos de esta misma versión: "1.21-" también es prefijo de "1.21-pre1-..."
+        stale = re.compile(re.escape(prefix) + r"[0-9a-f]{16}\.jsa")
+        for name in os.listdir(self.cache_dir):
+            if stale.fullmatch(name) and os.path.join(self.cache_dir, name) != path:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        mode = "use" if os.path.exists(path) else "create"
+        if java_major >= CDS_AUTO_JAVA:
+            return [f"-XX:SharedArchiveFile={path}", "-XX:+AutoCreateSharedArchive"], mode
+        if mode == "use":
+            return [f"-XX:SharedArchiveFile={path}"], mode
+        return [f"-XX:ArchiveClassesAtExit={path}"], mode
+
+
+def readahead_files(paths: list[str]) -> int:
+    """
+    Carga los archivos en la caché de páginas del sistema para que la JVM no espere al disco.
+    Con posix_fadvise el kernel los lee en segundo plano; si no existe (Windows) se leen a mano.
+    Devuelve los bytes solicitados.
+    """
+    total = 0
+    for path in paths:
+        try:
+            with open(path, "rb", buffering=0) as f:
+                size = os.fstat(f.fileno()).st_size
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, size, os.POSIX_FADV_WILLNEED)
+                else:
+                    while f.read(READAHEAD_CHUNK_SIZE):
+                        pass
+                total += size
+        except OSError:
+            continue
+    return total
+
+
+class ScaledImageCache:
+    """
+    Caché LRU de imágenes escaladas con presupuesto en bytes: al insertar, se expulsan
+    las entradas usadas hace más tiempo hasta que el total (ancho * alto * 4) cabe en el límite.
+    """
+
+    def __init__(self, budget_bytes: int = IMAGE_CACHE_BUDGET) -> None:
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._entries: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: tuple, value, size: tuple[int, int]) -> None:
+        cost = size[0] * size[1] * 4
+        if key in self._entries:
+            self.used_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, cost)
+        self.used_bytes += cost
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            _, (_, old_cost) = self._entries.popitem(last=False)
+            self.used_bytes -= old_cost
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _psutil():
+    """psutil es opcional: si no está instalado se usa /proc (Linux) o no hay métricas."""
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+
+class ProcessSampler:
+    """Muestra RSS, CPU y número de hilos de un proceso, con psutil o leyendo /proc en Linux."""
 
-# Configuración del logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self._ps = _psutil()
+        self._proc = self._ps.Process(pid) if self._ps else None
+        self._last_cpu: Optional[tuple[float, float]] = None
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
 
-def resource_path(relative_path: str) -> str:
-    """Obtiene la ruta absoluta al recurso, tanto en desarrollo como en modo frozen."""
+    def available(self) -> bool:
+        return self._proc is not None or os.path.exists(f"/proc/{self.pid}/stat")
+
+    def sample(self) -> Optional[dict]:
+        try:
+            if self._proc is not None:
+                with self._proc.oneshot():
+                    times = self._proc.cpu_times()
+                    rss = self._proc.memory_info().rss
+                    threads = self._proc.num_threads()
+                cpu_seconds = times.user + times.system
+            else:
+                with open(f"/proc/{self.pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu_seconds = (int(fields[11]) + int(fields[12])) / self._ticks
+                threads = int(fields[17])
+                rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        except Exception:
+            return None  # El proceso ya terminó o no hay forma de medirlo
+        now = time.monotonic()
+        cpu_percent = 0.0
+        if self._last_cpu:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                cpu_percent = (cpu_seconds - self._last_cpu[1]) / elapsed * 100
+        self._last_cpu = (now, cpu_seconds)
+        return {"rss_bytes": rss, "cpu_percent": round(cpu_percent, 1), "threads": threads}
+
+
+class GameSupervisor:
+    """
+    Dueño del proceso de Minecraft lanzado. Solo permite una instancia a la vez, vuelca
+    stdout/stderr a un log rotativo desde un hilo propio (sin bloquear la UI), muestrea
+    RSS/CPU/hilos de la JVM cada GAME_SAMPLE_INTERVAL segundos en metrics.json y, al terminar,
+    detecta cierres anómalos y errores de memoria y añade un resumen a sessions.jsonl.
+    """
+
+    def __init__(self, log_dir: str, sample_interval: float = GAME_SAMPLE_INTERVAL) -> None:
+        self.log_dir = log_dir
+        self.sample_interval = sample_interval
+        self.metrics_path = os.path.join(log_dir, "metrics.json")
+        self.sessions_path = os.path.join(log_dir, "sessions.jsonl")
+        self.process: Optional[subprocess.Popen] = None
+        self.metrics: dict = {}
+        self.on_exit: Optional[Callable[[dict], None]] = None
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger("mncka.game")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _open_log(self) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        if not self._logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.log_dir, "game.log"), maxBytes=GAME_LOG_MAX_BYTES,
+                backupCount=GAME_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._logger.addHandler(handler)
+
+    def start(self, cmd: list[str], cwd: Optional[str] = None, info: Optional[dict] = None) -> bool:
+        """Lanza el juego. Devuelve False si ya hay una instancia en marcha."""
+        with self._lock:
+            if self.is_running():
+                return False
+            self._open_log()
+            self._logger.info(f"=== Lanzando: {' '.join(cmd)}")
+            self.process = subprocess.Popen(cmd, cwd=cwd, stdin=subprocess.DEVNULL,
+                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            self.metrics = dict(info or {}, pid=self.process.pid, state="running", started=time.time(),
+                                rss_bytes=0, peak_rss_bytes=0, cpu_percent=0.0, threads=0,
+                                oom=False, crash_report=False)
+        process = self.process
+        pump = threading.Thread(target=self._pump_output, args=(process,), daemon=True)
+        pump.start()
+        threading.Thread(target=self._sample_loop, args=(process, pump), daemon=True).start()
+        return True
+
+    def _pump_output(self, process: subprocess.Popen) -> None:
+        for raw in process.stdout:
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            self._logger.info(line)
+            if "window_s" not in self.metrics and any(marker in line for marker in WINDOW_MARKERS):
+                self.metrics["window_s"] = round(time.time() - self.metrics["started"], 2)
+                TRACER.record("game.window", self.metrics["window_s"], version=self.metrics.get("version"),
+                              cds=self.metrics.get("cds"))
+                self._logger.info(f"=== Ventana del juego en {self.metrics['window_s']:.2f} s")
+            if any(marker in line for marker in OOM_MARKERS):
+                self.metrics["oom"] = True
+            elif any(marker in line for marker in CRASH_MARKERS):
+                self.metrics["crash_report"] = True
+        process.stdout.close()
+
+    def _sample_loop(self, process: subprocess.Popen, pump: threading.Thread) -> None:
+        sampler = ProcessSampler(process.pid)
+        if not sampler.available():
+            logging.info("Métricas de la JVM no disponibles (instala psutil para obtenerlas)")
+        while True:
+            try:
+                process.wait(timeout=self.sample_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            sample = sampler.sample() if sampler.available() else None
+            if sample:
+                self.metrics.update(sample, uptime_s=round(time.time() - self.metrics["started"], 1))
+                self.metrics["peak_rss_bytes"] = max(self.metrics["peak_rss_bytes"], sample["rss_bytes"])
+                self._write_metrics()
+        pump.join(timeout=5)  # Las últimas líneas pueden contener el error de memoria
+        self._finish(process)
+
+    def _write_metrics(self) -> None:
+        try:
+            write_json_atomic(self.metrics_path, self.metrics)
+        except OSError as e:
+            logging.warning(f"No se pudieron guardar las métricas del juego: {e}")
+
+    def _finish(self, process: subprocess.Popen) -> None:
+        code = process.returncode
+        m = self.metrics
+        m["exit_code"] = code
+        m["uptime_s"] = round(time.time() - m["started"], 1)
+        if m["oom"]:
+            m["state"] = "oom"
+        elif code != 0 or m["crash_report"]:
+            m["state"] = "crashed"
+        else:
+            m["state"] = "exited"
+        self._logger.info(f"=== El juego terminó con código {code} ({m['state']})")
+        TRACER.record("game.session", m["uptime_s"], version=m.get("version"), state=m["state"],
+                      exit_code=code, peak_rss_bytes=m["peak_rss_bytes"])
+        self._write_metrics()
+        try:
+            with open(self.sessions_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(m) + "\n")
+        except OSError as e:
+            logging.warning(f"No se pudo registrar la sesión de juego: {e}")
+        if self.on_exit:
+            self.on_exit(dict(m))
+
+    def status_text(self) -> str:
+        """Resumen corto del estado del juego para la interfaz."""
+        m = self.metrics
+        if not m:
+            return ""
+        if m.get("state") != "running":
+            return f"Minecraft: {m['state']}"
+        if not m.get("rss_bytes"):
+            return "Minecraft: en ejecución"
+        window = f", ventana en {m['window_s']:.1f} s" if m.get("window_s") else ""
+        return (f"Minecraft: {m['rss_bytes'] / 1024 ** 3:.2f} GB RAM (pico {m['peak_rss_bytes'] / 1024 ** 3:.2f} GB), "
+                f"{m['cpu_percent']:.0f}% CPU, {m['threads']} hilos{window}")
+
+    def launch_times(self, version_id: str) -> dict[str, list[float]]:
+        """Tiempos hasta la ventana de las sesiones registradas de una versión, con y sin CDS."""
+        times: dict[str, list[float]] = {"con CDS": [], "sin CDS": []}
+        try:
+            with open(self.sessions_path, encoding="utf-8") as f:
+                sessions = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return times
+        for session in sessions:
+            if session.get("version") == version_id and session.get("window_s"):
+                # La sesión que crea el archivo no se beneficia de él: cuenta como "sin CDS"
+                times["con CDS" if session.get("cds") == "use" else "sin CDS"].append(session["window_s"])
+        return times
+
+
+def total_memory_mb() -> Optional[int]:
+    """Memoria física total del equipo en MiB, o None si no se puede determinar."""
+    ps = _psutil()
+    if ps:
+        return ps.virtual_memory().total // 1048576
+    if platform.system() == "Windows":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys // 1048576
+        return None
     try:
-        base_path = sys._MEIPASS
-    except Exception:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 1048576
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def java_major_version(java: str) -> Optional[int]:
+    """Versión principal de Java (8, 17, 21...) de un ejecutable, leyendo 'java -version'."""
+    try:
+        out = subprocess.run([java, "-version"], capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', out.stderr + out.stdout)
+    if not match:
+        return None
+    major = int(match.group(1))
+    return int(match.group(2) or 0) if major == 1 else major  # "1.8.0_x" -> 8
+
+
+def recommended_heap_mb(total_mb: Optional[int], mod_count: int, fabric: bool) -> int:
+    """Heap recomendado según los mods instalados, limitado por la memoria física del equipo."""
+    heap = JVM_BASE_HEAP_MB + (JVM_FABRIC_HEAP_MB if fabric else 0) + mod_count * JVM_HEAP_PER_MOD_MB
+    if total_mb:
+        heap = min(heap, max_heap_mb(total_mb))
+    return heap
+
+
+def max_heap_mb(total_mb: int) -> int:
+    """Heap máximo que no fuerza al sistema a usar swap: la mitad de la RAM o lo que quede tras la reserva."""
+    if total_mb < 2 * JVM_OS_RESERVE_MB:
+        return max(1024, total_mb // 2)
+    return total_mb - JVM_OS_RESERVE_MB
+
+
+def jvm_arguments(profile: str, java_major: Optional[int], total_mb: Optional[int], mod_count: int,
+                  fabric: bool, requested_gb: int = 0) -> tuple[list[str], list[str]]:
+    """
+    Argumentos de la JVM para un perfil: tamaño de heap (automático o el pedido por el usuario,
+    limitado a la memoria física) y opciones del recolector. Devuelve (argumentos, avisos).
+    """
+    warnings = []
+    heap = requested_gb * 1024 if requested_gb else recommended_heap_mb(total_mb, mod_count, fabric)
+    if total_mb and heap > max_heap_mb(total_mb):
+        warnings.append(f"{requested_gb} GB es demasiado para este equipo ({total_mb // 1024} GB de RAM); "
+                        f"se usarán {max_heap_mb(total_mb) / 1024:.1f} GB.")
+        heap = max_heap_mb(total_mb)
+    if profile == "auto":
+        # ZGC solo compensa con heaps grandes; en equipos justos, el perfil de baja memoria
+        if total_mb is not None and total_mb < 6144:
+            profile = "low_memory"
+        elif heap >= 8192 and (java_major or 0) >= 21:
+            profile = "zgc"
+        else:
+            profile = "g1"
+    settings = JVM_PROFILES.get(profile, JVM_PROFILES["g1"])
+    if java_major is not None and java_major < settings["min_java"]:
+        warnings.append(f"El perfil {settings['label']} requiere Java {settings['min_java']} o superior "
+                        f"(detectado Java {java_major}); se usará {JVM_PROFILES['g1']['label']}.")
+        profile, settings = "g1", JVM_PROFILES["g1"]
+    args = list(settings["args"])
+    if profile == "zgc" and java_major is not None and 21 <= java_major < 23:
+        args.append("-XX:+ZGenerational")  # Por defecto a partir de Java 23
+    initial = min(512, heap) if profile == "low_memory" else heap
+    return [f"-Xmx{heap}M", f"-Xms{initial}M"] + args, warnings
+
+
+def sha1_mmap(path: str) -> Optional[str]:
+    """SHA-1 de un archivo leído con mmap (sin copias intermedias). None si no se puede leer."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return hashlib.sha1().hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return hashlib.sha1(m).hexdigest()
+    except OSError:
+        return None
+
+
+class IntegrityVerifier:
+    """
+    Comprueba los archivos de una versión instalada (jar, librerías, nativos, assets y mods
+    conocidos) contra el SHA-1 de su JSON de versión / índice de assets / Modrinth.
+    El hash se calcula en un pool de procesos con lecturas mmap y se guarda en
+    cache/verify.json por (ruta, tamaño, mtime), así que una segunda comprobación solo
+    hace stat de cada archivo. Los hashes publicados por Modrinth se guardan en
+    cache/modrinth.json por SHA-1 del archivo local.
+    """
+
+    def __init__(self, minecraft_dir: str) -> None:
+        self.minecraft_dir = minecraft_dir
+        self.cache_path = os.path.join(minecraft_dir, "cache", "verify.json")
+        self.modrinth_path = os.path.join(minecraft_dir, "cache", "modrinth.json")
+        self._cache: dict[str, list] = self._load(self.cache_path)
+        self._modrinth: dict[str, dict] = self._load(self.modrinth_path)
+
+    @staticmethod
+    def _load(path: str) -> dict:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            write_json_atomic(self.cache_path, self._cache)
+            write_json_atomic(self.modrinth_path, self._modrinth)
+        except OSError as e:
+            logging.warning(f"No se pudo guardar la caché de verificación: {e}")
+
+    def _digest(self, path: str, st: os.stat_result) -> Optional[str]:
+        """SHA-1 del archivo, desde la caché si su tamaño y mtime no han cambiado."""
+        cached = self._cache.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = sha1_mmap(path)
+        if digest is not None:
+            self._cache[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def known_mod_files(self, session: requests.Session) -> list[VersionFile]:
+        """
+        Mods conocidos presentes en mods/ con los hashes que publica Modrinth para ellos.
+        Solo se consulta Modrinth cuando el archivo local no coincide con una respuesta ya guardada.
+        """
+        files = []
+        changed = False
+        for url in KNOWN_MODS.values():
+            path = os.path.join(self.minecraft_dir, "mods", filename_from_url(url))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest = self._digest(path, st)
+            info = self._modrinth.get(digest) if digest else None
+            if not info or info.get("url") != url:
+                info = modrinth_file_info(session, url)
+                if info and digest and info.get("sha1") == digest:
+                    self._modrinth[digest] = dict(info, url=url)
+                    changed = True
+            if info and info.get("sha1"):
+                files.append(VersionFile(path, url, info["sha1"], info.get("size")))
+        if changed:
+            self._save()
+        return files
+
+    def verify(self, files: list[VersionFile],
+               on_event: Optional[Callable[[InstallEvent], None]] = None) -> list[VersionFile]:
+        """Devuelve los archivos que faltan o cuyo hash no coincide."""
+        emit = on_event or (lambda event: None)
+        unique = {vf.path: vf for vf in files if vf.sha1}
+        failing = []
+        to_hash: list[tuple[VersionFile, int, int]] = []
+        for vf in unique.values():
+            try:
+                st = os.stat(vf.path)
+            except OSError:
+                failing.append(vf)
+                continue
+            if vf.size is not None and st.st_size != vf.size:
+                failing.append(vf)
+                continue
+            cached = self._cache.get(vf.path)
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                if cached[2] != vf.sha1.lower():
+                    failing.append(vf)
+                continue
+            to_hash.append((vf, st.st_size, st.st_mtime_ns))
+        total = len(unique)
+        done = total - len(to_hash)
+        emit(InstallEvent("Verificando", done, total))
+        logging.info(f"Verificando {len(to_hash)} de {total} archivos ({done} ya comprobados en la caché)")
+
+        paths = [vf.path for vf, _, _ in to_hash]
+        if len(paths) >= VERIFY_POOL_THRESHOLD:
+            # spawn: no se hace fork de un proceso con hilos de Tk
+            with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as pool:
+                digests = pool.map(sha1_mmap, paths, chunksize=VERIFY_CHUNKSIZE)
+                hashed = self._collect(to_hash, digests, done, total, emit, failing)
+        else:
+            hashed = self._collect(to_hash, map(sha1_mmap, paths), done, total, emit, failing)
+        if hashed:
+            self._save()
+        return failing
+
+    def _collect(self, to_hash, digests, done, total, emit, failing) -> int:
+        last = time.monotonic()
+        count = 0
+        for (vf, size, mtime_ns), digest in zip(to_hash, digests):
+            count += 1
+            if digest is None or digest != vf.sha1.lower():
+                failing.append(vf)
+            if digest is not None:
+                self._cache[vf.path] = [size, mtime_ns, digest]
+            now = time.monotonic()
+            if now - last >= DOWNLOAD_PROGRESS_INTERVAL:
+                last = now
+                emit(InstallEvent("Verificando", done + count, total))
+        emit(InstallEvent("Verificando", done + count, total))
+        return count
+
+    def repair(self, failing: list[VersionFile], engine: DownloadEngine,
+               on_event: Optional[Callable[[InstallEvent], None]] = None) -> list[DownloadResult]:
+        """Vuelve a descargar solo los archivos dañados o ausentes."""
+        emit = on_event or (lambda event: None)
+        jobs = []
+        store = engine.store
+        for vf in failing:
+            if not vf.url:
+                continue
+            obj = store.path_for(vf.sha1) if store else None
+            if obj and os.path.exists(obj) and (
+                    (os.path.exists(vf.path) and os.path.samefile(obj, vf.path))
+                    or sha1_mmap(obj) != vf.sha1.lower()):
+                # El objeto compartido es el mismo inode dañado, o una copia que también lo está
+                store.discard(vf.sha1)
+            self._cache.pop(vf.path, None)
+            jobs.append(DownloadJob(os.path.basename(vf.path), vf.url, vf.path, vf.size, vf.sha1))
+
+        def on_progress(p: DownloadProgress) -> None:
+            emit(InstallEvent("Reparando", p.files_done, p.files_total, p.bytes_done, p.bytes_total, p.bytes_per_sec))
+
+        results = engine.run(jobs, on_progress)
+        # Lo reparado ya se comprobó al descargarlo (o viene de un objeto verificado arriba)
+        for result in results:
+            if result.ok and os.path.isfile(result.job.dest):
+                st = os.stat(result.job.dest)
+                self._cache[result.job.dest] = [st.st_size, st.st_mtime_ns, result.job.sha1.lower()]
+        self._save()
+        return results
+
+
+def default_minecraft_dir() -> str:
+    """La carpeta "MNC_KA Client" junto al archivo .py o .exe."""
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
         base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, relative_path)
+    return os.path.join(base_path, "MNC_KA Client")
+
+
+def create_minecraft_folders(minecraft_dir: str) -> None:
+    """Crea las carpetas necesarias para el cliente Minecraft."""
+    folders = [
+        minecraft_dir,
+        os.path.join(minecraft_dir, "assets"),
+        os.path.join(minecraft_dir, "songs"),
+        os.path.join(minecraft_dir, "libraries"),
+        os.path.join(minecraft_dir, "runtime"),
+        os.path.join(minecraft_dir, "mods")  # Para los mods
+    ]
+    for folder in folders:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+            logging.info(f"Carpeta creada: {folder}")
+
+
+def load_settings(minecraft_dir: str) -> dict:
+    """Configuración de usuario guardada (usuario, RAM, perfil de la JVM, versión seleccionada)."""
+    try:
+        with open(os.path.join(minecraft_dir, SETTINGS_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(minecraft_dir: str, settings: dict) -> None:
+    try:
+        write_json_atomic(os.path.join(minecraft_dir, SETTINGS_FILENAME), settings)
+    except OSError as e:
+        logging.warning(f"No se pudo guardar la configuración: {e}")
+
+
+def install_fabric_loader(minecraft_dir: str, vanilla_ver: str, loader: str, engine: DownloadEngine) -> str:
+    """Instala la versión vanilla (por el pipeline concurrente) y Fabric encima. Devuelve el id del perfil."""
+    install_version(minecraft_dir, vanilla_ver, engine)
+    with TRACER.span("install.fabric", version=vanilla_ver, loader=loader):
+        minecraft_launcher_lib.fabric.install_fabric(vanilla_ver, minecraft_dir, loader)
+    return f"fabric-loader-{loader}-{vanilla_ver}"
+
+
+class ManifestError(ValueError):
+    """El manifiesto de aprovisionamiento no es válido."""
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Lee y valida un manifiesto de aprovisionamiento (JSON):
+
+        {
+          "minecraft_dir": "opcional, por defecto la carpeta junto al launcher",
+          "versions": ["1.21.4"],
+          "fabric_loader": "0.16.10",          (opcional; instala Fabric en cada versión)
+          "mods": ["Sodium", {"name": "X", "url": "https://...", "sha1": "..."}],
+          "username": "Jugador", "ram": 4, "jvm_profile": "auto",
+          "download_limit_mb": 2,                (opcional; MiB/s para todas las descargas)
+          "mirrors": {"https://cdn.modrinth.com": ["https://espejo.local/modrinth"]}
+        }
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"No se pudo leer el manifiesto {path}: {e}")
+    if not isinstance(manifest, dict):
+        raise ManifestError("El manifiesto debe ser un objeto JSON")
+    versions = manifest.get("versions", [])
+    if not isinstance(versions, list) or not all(isinstance(v, str) and v for v in versions):
+        raise ManifestError("'versions' debe ser una lista de versiones")
+    mods = []
+    for mod in manifest.get("mods", []):
+        if isinstance(mod, str):
+            if mod not in KNOWN_MODS:
+                raise ManifestError(f"Mod desconocido: {mod} (conocidos: {', '.join(KNOWN_MODS)})")
+            mods.append({"name": mod, "url": KNOWN_MODS[mod]})
+        elif isinstance(mod, dict) and mod.get("name") and mod.get("url"):
+            mods.append(mod)
+        else:
+            raise ManifestError(f"Entrada de mod no válida: {mod!r}")
+    if mods and not manifest.get("fabric_loader"):
+        raise ManifestError("Los mods requieren 'fabric_loader'")
+    if mods and not any(m["url"] == FABRIC_API_URL for m in mods):
+        mods.insert(0, {"name": "FabricAPI", "url": FABRIC_API_URL})
+    ram = manifest.get("ram", 0)
+    if not isinstance(ram, int) or ram < 0:
+        raise ManifestError("'ram' debe ser un número entero de GB (0 = automática)")
+    if manifest.get("jvm_profile", "auto") not in JVM_PROFILES:
+        raise ManifestError(f"'jvm_profile' debe ser uno de: {', '.join(JVM_PROFILES)}")
+    limit = manifest.get("download_limit_mb", 0)
+    if not isinstance(limit, (int, float)) or limit < 0:
+        raise ManifestError("'download_limit_mb' debe ser un número de MiB/s (0 = sin límite)")
+    mirrors = manifest.get("mirrors", {})
+    if not isinstance(mirrors, dict) or not all(isinstance(alts, list) and all(isinstance(a, str) for a in alts)
+                                                for alts in mirrors.values()):
+        raise ManifestError("'mirrors' debe asociar cada URL base con una lista de URLs de espejos")
+    manifest["mods"] = mods
+    return manifest
+
+
+class Provisioner:
+    """
+    Aprovisionamiento sin interfaz gráfica a partir de un manifiesto: instala todas las versiones
+    (y Fabric) en paralelo, descarga los mods en el mismo pool mientras tanto, guarda la
+    configuración de usuario y deja preparadas las plantillas de lanzamiento.
+    Reutiliza el almacén de artefactos compartido de la máquina.
+    """
+
+    def __init__(self, manifest: dict, minecraft_dir: Optional[str] = None) -> None:
+        self.manifest = manifest
+        self.minecraft_dir = minecraft_dir or manifest.get("minecraft_dir") or default_minecraft_dir()
+        self.store = ArtifactStore.default()
+        self.engine = DownloadEngine(store=self.store, limit_mb=manifest.get("download_limit_mb", DOWNLOAD_LIMIT_MB),
+                                     mirrors=manifest.get("mirrors"))
+        self.timings: list[tuple[str, float, bool]] = []
+        self._lock = threading.Lock()
+        self._fabric_lock = threading.Lock()  # El instalador de Fabric comparte librerías entre versiones
+        self._finalize_lock = threading.Lock()  # Y los pasos locales, el runtime de Java
+
+    def _step(self, name: str, func: Callable[[], object]) -> bool:
+        start = time.perf_counter()
+        ok = True
+        try:
+            func()
+        except Exception as e:
+            ok = False
+            logging.error(f"{name}: {e}")
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.timings.append((name, seconds, ok))
+        TRACER.record("provision.step", seconds, step=name, ok=ok)
+        return ok
+
+    def _install_target(self, ver: str) -> Optional[str]:
+        """Instala una versión (con Fabric si se pidió). Devuelve el id que se lanzará."""
+        loader = self.manifest.get("fabric_loader")
+        install = lambda: install_version(self.minecraft_dir, ver, self.engine, finalize_lock=self._finalize_lock)
+        if not loader:
+            ok = self._step(f"instalar {ver}", install)
+            return ver if ok else None
+        if not self._step(f"instalar {ver}", install):
+            return None
+
+        def fabric() -> None:
+            with self._fabric_lock:
+                minecraft_launcher_lib.fabric.install_fabric(ver, self.minecraft_dir, loader)
+        ok = self._step(f"instalar Fabric {loader} en {ver}", fabric)
+        return f"fabric-loader-{loader}-{ver}" if ok else None
+
+    def _download_mods(self) -> None:
+        mods_folder = os.path.join(self.minecraft_dir, "mods")
+        jobs = [DownloadJob(m["name"], m["url"], os.path.join(mods_folder, filename_from_url(m["url"])),
+                            m.get("size"), m.get("sha1"), m.get("sha512"), PRIORITY_OPTIONAL)
+                for m in self.manifest["mods"]]
+        fill_modrinth_checksums(self.engine.session, jobs)
+        failed = [r for r in self.engine.run(jobs) if not r.ok]
+        if failed:
+            raise RuntimeError(", ".join(f"{r.job.name} ({r.error})" for r in failed))
+
+    def run(self) -> int:
+        start = time.perf_counter()
+        create_minecraft_folders(self.minecraft_dir)
+        versions = self.manifest["versions"]
+        with ThreadPoolExecutor(max_workers=max(len(versions), 1) + 1) as pool:
+            mods_future = pool.submit(self._step, "descargar mods", self._download_mods) \
+                if self.manifest["mods"] else None
+            targets = list(pool.map(self._install_target, versions))
+            mods_ok = mods_future.result() if mods_future else True
+        if mods_ok and self.manifest["mods"]:
+            # Solo las versiones instaladas: en las que fallaron, la interfaz debe seguir ofreciendo los mods
+            for ver in (v for v, target in zip(versions, targets) if target):
+                with open(os.path.join(self.minecraft_dir, "mods", f"mods_installed_{ver}.txt"), "w") as f:
+                    f.write("mods_installed")
+        installed = [t for t in targets if t]
+        if self.manifest["mods"]:
+            mod_index = ModIndex(self.minecraft_dir)
+            for ver, target in zip(versions, targets):
+                if target and target != ver:
+                    for problem in mod_index.check(ver, self.manifest["fabric_loader"]):
+                        logging.warning(f"Mods en {target}: {problem}")
+        for target in installed:
+            self._step(f"preparar lanzamiento {target}", lambda t=target: LaunchCommandCache(
+                self.minecraft_dir).template(t, {'launcherVersion': LAUNCHER_VERSION}))
+        settings = load_settings(self.minecraft_dir)
+        for key in ("username", "ram", "jvm_profile", "download_limit_mb", "mirrors"):
+            if key in self.manifest:
+                settings[key] = self.manifest[key]
+        if installed:
+            settings["selected_version"] = installed[0]
+        save_settings(self.minecraft_dir, settings)
+        InstalledIndex(self.minecraft_dir).refresh()
+        self.print_summary(time.perf_counter() - start)
+        return EXIT_OK if all(ok for _, _, ok in self.timings) else EXIT_FAILED
+
+    def print_summary(self, total: float) -> None:
+        print(f"Aprovisionamiento de {self.minecraft_dir}:")
+        for name, seconds, ok in self.timings:
+            print(f"  {'OK   ' if ok else 'ERROR'} {name:<50} {seconds:8.2f} s")
+        print(f"  Total{'':<51} {total:8.2f} s")
+
+
+def provision(manifest_path: str, minecraft_dir: Optional[str] = None) -> int:
+    """Punto de entrada de --provision. Devuelve el código de salida del proceso."""
+    try:
+        manifest = load_manifest(manifest_path)
+    except ManifestError as e:
+        logging.error(str(e))
+        return EXIT_BAD_MANIFEST
+    provisioner = Provisioner(manifest, minecraft_dir)
+    code = provisioner.run()
+    if TRACER.enabled:
+        path = os.path.join(provisioner.minecraft_dir, "logs", "launcher", "trace.jsonl")
+        try:
+            print(f"{TRACER.export_jsonl(path)} spans guardados en {path}")
+        except OSError as e:
+            logging.warning(f"No se pudieron guardar las trazas: {e}")
+    return code
+
+
+class MusicService:
+    """
+    Reproducción de la carpeta songs/ sin tocar el hilo de Tk. Un hilo propio inicializa el
+    mezclador, mantiene el índice de canciones (solo se vuelve a listar si cambia el mtime de la
+    carpeta) y, mientras suena la actual, un hilo decodificador prepara la siguiente pista; al
+    terminar se encola en el mismo canal (Channel.queue) y no hay silencio entre canciones. Las pistas decodificadas
+    ocupan memoria PCM: si la actual más la siguiente no caben en budget_bytes, la siguiente se
+    reproduce en streaming con mixer.music (con un pequeño hueco al cambiar de pista).
+    toggle(), next() y stop() se pueden llamar desde cualquier hilo y no bloquean.
+    """
+
+    def __init__(self, songs_dir: str, budget_bytes: int = MUSIC_DECODE_BUDGET,
+                 on_error: Optional[Callable[[str], None]] = None) -> None:
+        self.songs_dir = songs_dir
+        self.budget_bytes = budget_bytes
+        self.on_error = on_error
+        self.state = "stopped"  # stopped, playing o paused
+        self._commands: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._songs: list[str] = []
+        self._songs_mtime_ns: Optional[int] = None
+        self._channel = None
+        # (posición en la lista, nombre, Sound decodificado o None si va en streaming)
+        self._current: Optional[tuple[int, str, object]] = None
+        self._next: Optional[tuple[int, str, object]] = None
+        # Decodificación en curso de la siguiente pista, para no bloquear las órdenes mientras tanto
+        self._decoder: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[tuple[int, str, Future]] = None
+
+    def toggle(self) -> None:
+        """Empieza la lista, o la pausa/reanuda si ya está sonando."""
+        self._send("toggle")
+
+    def next(self) -> None:
+        self._send("next")
+
+    def stop(self) -> None:
+        self._send("stop")
+
+    def _send(self, command: str) -> None:
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="musica", daemon=True)
+                self._thread.start()
+        self._commands.put(command)
+
+    def songs(self) -> list[str]:
+        """Canciones de la carpeta en orden alfabético (desde el índice si la carpeta no ha cambiado)."""
+        try:
+            mtime_ns = os.stat(self.songs_dir).st_mtime_ns
+        except OSError:
+            self._songs, self._songs_mtime_ns = [], None
+            return []
+        if mtime_ns != self._songs_mtime_ns:
+            self._songs = sorted(n for n in os.listdir(self.songs_dir) if n.lower().endswith(MUSIC_EXTENSIONS))
+            self._songs_mtime_ns = mtime_ns
+        return self._songs
+
+    def _run(self) -> None:
+        while True:
+            try:
+                command = self._commands.get(timeout=MUSIC_POLL_INTERVAL)
+            except queue.Empty:
+                command = None
+            try:
+                if command == "toggle":
+                    self._toggle()
+                elif command == "next" and self.state != "stopped":
+                    self._play(self._current[0] + 1 if self._current else 0)
+                elif command == "stop":
+                    self._stop()
+                if self.state == "playing":
+                    self._advance()
+            except Exception as e:
+                logging.exception("Error al reproducir la música.")
+                self._stop()
+                self._report(f"Error al reproducir la canción: {e}")
+
+    def _report(self, message: str) -> None:
+        if self.on_error:
+            self.on_error(message)
+
+    def _toggle(self) -> None:
+        if self.state == "playing":
+            self._channel.pause()
+            pygame.mixer.music.pause()
+            self.state = "paused"
+        elif self.state == "paused":
+            self._channel.unpause()
+            pygame.mixer.music.unpause()
+            self.state = "playing"
+        else:
+            if not pygame.mixer.get_init():
+                with TRACER.span("music.mixer_init"):
+                    pygame.mixer.init()
+            if self._channel is None:
+                pygame.mixer.set_reserved(1)  # El canal 0 queda para la lista de reproducción
+                self._channel = pygame.mixer.Channel(0)
+            if not self.songs():
+                self._report("No hay canciones en la carpeta 'songs'")
+                return
+            self._play(0)
+
+    def _pcm_bytes(self, sound) -> int:
+        frequency, size, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * frequency * channels * abs(size) // 8)
+
+    def _decode(self, name: str, reserved: int = 0):
+        """Decodifica una pista entera en memoria, o None si no cabe en el presupuesto o no se puede."""
+        path = os.path.join(self.songs_dir, name)
+        ratio = 1 if name.lower().endswith(".wav") else MUSIC_COMPRESSION_RATIO
+        if reserved + os.path.getsize(path) * ratio > self.budget_bytes:
+            return None
+        with TRACER.span("music.decode", track=name) as span:
+            try:
+                sound = pygame.mixer.Sound(path)
+            except pygame.error as e:
+                logging.info(f"No se pudo decodificar {name} ({e}); se reproducirá en streaming")
+                return None
+            pcm = self._pcm_bytes(sound)
+            span.set(pcm_bytes=pcm)
+        return sound if reserved + pcm <= self.budget_bytes else None
+
+    def _play(self, position: int) -> None:
+        """Empieza a sonar la pista position (módulo la longitud de la lista)."""
+        songs = self.songs()
+        if not songs:
+            self._stop()
+            return
+        position %= len(songs)
+        name = songs[position]
+        upcoming = self._next if self._next and self._next[1] == name else None
+        pending = self._pending if self._pending and self._pending[1] == name else None
+        if self._pending and not pending:
+            self._pending[2].cancel()
+        self._pending = None
+        self._channel.stop()
+        pygame.mixer.music.stop()
+        self._current = self._next = None  # Libera los buffers anteriores antes de decodificar otro
+        if upcoming:
+            sound = upcoming[2]
+        elif pending:
+            sound = pending[2].result()  # Ya estaba decodificándose: se espera a que termine
+        else:
+            sound = self._decode(name)
+        if sound is not None:
+            self._channel.play(sound)
+        else:
+            pygame.mixer.music.load(os.path.join(self.songs_dir, name))
+            pygame.mixer.music.play()
+        self._current = (position, name, sound)
+        self.state = "playing"
+        logging.info(f"Reproduciendo {name}")
+        self._prefetch()
+
+    def _prefetch(self) -> None:
+        """Encarga al hilo decodificador la pista siguiente; _advance() la recoge cuando esté lista."""
+        songs = self.songs()
+        position = (self._current[0] + 1) % len(songs)
+        name = songs[position]
+        current_sound = self._current[2]
+        if name == self._current[1] and current_sound is not None:
+            self._set_next(position, name, current_sound)  # Una sola canción: se repite el mismo buffer
+            return
+        reserved = self._pcm_bytes(current_sound) if current_sound is not None else 0
+        if self._decoder is None:
+            self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="musica-decode")
+        self._pending = (position, name, self._decoder.submit(self._decode, name, reserved))
+
+    def _set_next(self, position: int, name: str, sound) -> None:
+        """Fija la pista siguiente y, si las dos están decodificadas, la encola sin hueco."""
+        self._next = (position, name, sound)
+        if self._current[2] is not None and sound is not None:
+            self._channel.queue(sound)
+
+    def _advance(self) -> None:
+        """Detecta el cambio de pista: la encolada ya suena, o la actual terminó sin sucesora en cola."""
+        if self._pending and self._pending[2].done():
+            pending_position, pending_name, future = self._pending
+            self._pending = None
+            self._set_next(pending_position, pending_name, future.result())
+        position, name, sound = self._current
+        if sound is None:
+            if not pygame.mixer.music.get_busy():
+                self._play(position + 1)
+            return
+        upcoming = self._next
+        # Mientras la siguiente espera en cola get_queue() la devuelve; al empezar a sonar, None
+        if upcoming and upcoming[2] is not None and self._channel.get_busy() \
+                and self._channel.get_queue() is None and self._channel.get_sound() == upcoming[2]:
+            self._current, self._next = upcoming, None
+            logging.info(f"Reproduciendo {upcoming[1]}")
+            self._prefetch()
+        elif not self._channel.get_busy():
+            self._play(position + 1)
+
+    def _stop(self) -> None:
+        if self._channel is not None:
+            self._channel.stop()
+        if pygame.mixer.get_init():
+            pygame.mixer.music.stop()
+        if self._pending:
+            self._pending[2].cancel()
+        self._current = self._next = self._pending = None
+        self.state = "stopped"
+
+
+class ProgressTask:
+    """Tarea en el panel de progreso compartido. update() y finish() se pueden llamar desde cualquier hilo."""
+
+    def __init__(self, dispatcher: "UIDispatcher", task_id: int, title: str) -> None:
+        self.dispatcher = dispatcher
+        self.task_id = task_id
+        self.title = title
+
+    def update(self, percent: float, text: str = "") -> None:
+        self.dispatcher.set_progress(self.task_id, (self.title, min(percent, 100), text))
+
+    def finish(self) -> None:
+        self.dispatcher.set_progress(self.task_id, None)
+
+
+class ProgressPanel:
+    """Una única ventana (no modal) con una fila por tarea en curso. Solo se usa desde el hilo de Tk."""
+
+    def __init__(self, root: tk.Tk) -> None:
+        self.root = root
+        self.win: Optional[tk.Toplevel] = None
+        self.rows: dict[int, tuple[tk.Frame, ttk.Progressbar, tk.Label]] = {}
+
+    def set(self, task_id: int, title: str, percent: float, text: str) -> None:
+        if self.win is None or not self.win.winfo_exists():
+            self.win = tk.Toplevel(self.root)
+            self.win.title("Tareas en curso")
+            self.win.transient(self.root)
+            self.win.protocol("WM_DELETE_WINDOW", self.win.withdraw)
+            self.rows.clear()
+        if task_id not in self.rows:
+            frame = tk.Frame(self.win)
+            frame.pack(fill="x", padx=10, pady=5)
+            tk.Label(frame, text=f"{title}...", anchor="w").pack(fill="x")
+            bar = ttk.Progressbar(frame, orient="horizontal", length=330, mode="determinate")
+            bar.pack(fill="x")
+            label = tk.Label(frame, anchor="w")
+            label.pack(fill="x")
+            self.rows[task_id] = (frame, bar, label)
+            self.win.deiconify()
+        _, bar, label = self.rows[task_id]
+        bar["value"] = percent
+        label.config(text=f"{percent:.0f}% — {text}" if text else f"{percent:.0f}%")
+
+    def remove(self, task_id: int) -> None:
+        row = self.rows.pop(task_id, None)
+        if row:
+            row[0].destroy()
+        if not self.rows and self.win is not None:
+            self.win.destroy()
+            self.win = None
+
+
+class UIDispatcher:
+    """
+    Único punto de paso entre los hilos de trabajo y Tk (que no es seguro entre hilos).
+    Los hilos encolan callbacks con post() o esperan un resultado con call() (p. ej. un askyesno);
+    el bucle de Tk los ejecuta cada UI_FRAME_MS con un presupuesto de tiempo por frame.
+    Las actualizaciones de progreso se agrupan: solo se dibuja el último valor de cada tarea por frame.
+    """
+
+    def __init__(self, root: tk.Tk) -> None:
+        self.root = root
+        self.panel = ProgressPanel(root)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._progress: dict[int, Optional[tuple]] = {}
+        self._progress_lock = threading.Lock()
+        self._next_id = 0
+        self._main_thread = threading.current_thread()
+        self.slow_callbacks = 0
+        self.root.after(UI_FRAME_MS, self._pump)
+
+    def post(self, func: Callable, *args) -> None:
+        """Ejecuta func(*args) en el hilo de Tk (sin esperar)."""
+        self._queue.put((func, args))
+
+    def call(self, func: Callable, *args):
+        """Ejecuta func(*args) en el hilo de Tk y devuelve su resultado, bloqueando al hilo llamante."""
+        if threading.current_thread() is self._main_thread:
+            return func(*args)
+        done = threading.Event()
+        result = {}
+
+        def run() -> None:
+            try:
+                result["value"] = func(*args)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        self.post(run)
+        done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+
+    def progress_task(self, title: str, text: str = "") -> ProgressTask:
+        with self._progress_lock:
+            self._next_id += 1
+            task = ProgressTask(self, self._next_id, title)
+        task.update(0, text)
+        return task
+
+    def set_progress(self, task_id: int, state: Optional[tuple]) -> None:
+        with self._progress_lock:
+            self._progress[task_id] = state
+
+    def _pump(self) -> None:
+        # Se reprograma antes de ejecutar nada: un callback puede abrir un diálogo modal
+        # y el bucle anidado del diálogo debe seguir atendiendo la cola
+        self.root.after(UI_FRAME_MS, self._pump)
+        deadline = time.perf_counter() + UI_CALLBACK_BUDGET
+        while time.perf_counter() < deadline:
+            try:
+                func, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            start = time.perf_counter()
+            try:
+                func(*args)
+            except Exception:
+                logging.exception("Error en un callback de la interfaz")
+            if time.perf_counter() - start > UI_FRAME_MS / 1000:
+                self.slow_callbacks += 1
+                logging.debug(f"Callback lento en la interfaz: {getattr(func, '__name__', func)}")
+        with self._progress_lock:
+            pending, self._progress = self._progress, {}
+        for task_id, state in pending.items():
+            if state is None:
+                self.panel.remove(task_id)
+            else:
+                self.panel.set(task_id, *state)
 
-# URLs fijas de mods
-SODIUM_URL = "https://cdn.modrinth.com/data/AANobbMI/versions/FRXt5xaI/sodium-fabric-0.6.10%2Bmc1.21.4.jar"
-LITHIUM_URL = "https://cdn.modrinth.com/data/gvQqBUqZ/versions/kLc5Oxr4/lithium-fabric-0.14.8%2Bmc1.21.4.jar"
-SKIN_OVERRIDES_URL = "https://cdn.modrinth.com/data/GON0Fdk5/versions/MU0u3ea4/skin_overrides-2.2.3%2B1.21.4.jar"
-FABRIC_API_URL = "https://cdn.modrinth.com/data/P7dR8mSH/versions/ZNwYCTsk/fabric-api-0.118.0%2B1.21.4.jar"
 
 class ResizableWindow:
-    def __init__(self) -> None:
-        self.window = tk.Tk()
+    def __init__(self, profile_startup: bool = False, minecraft_dir: Optional[str] = None) -> None:
+        self.profile_startup = profile_startup
+        with STARTUP.phase("crear ventana Tk"):
+            self.window = tk.Tk()
+        self.ui = UIDispatcher(self.window)
         self.original_width = 800
         self.original_height = 600
 
         # Variables para optimización de redimensionamiento
-        self._resize_id = None
         self._last_resize_time = 0
         self._resize_delay = 150
-        self._max_cache_size = 5
+        self._settle_id = None
 
         # Diccionario para almacenar las versiones Fabric instaladas:
         # {vanilla_version: fabric_version_id}
         self.fabric_versions: dict[str, str] = {}
 
-        # Determinar la carpeta base donde se encuentra el script o ejecutable
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
-
         # La carpeta "MNC_KA Client" se creará junto al archivo .py o .exe
-        self.minecraft_dir = os.path.join(base_path, "MNC_KA Client")
-        self.create_minecraft_folders()
-        self.preguntar_version()  # Pregunta la versión vanilla si aún no se ha instalado
+        self.minecraft_dir = minecraft_dir or default_minecraft_dir()
+        self.store: Optional[ArtifactStore] = None
+        self.downloader = DownloadEngine()
+        self.command_cache = LaunchCommandCache(self.minecraft_dir)
+        self.game = GameSupervisor(os.path.join(self.minecraft_dir, "logs", "launcher"))
+        self._launching = False  # Hay un lanzamiento preparándose en segundo plano
+        self.game.on_exit = self._on_game_exit
+        self.music = MusicService(os.path.join(self.minecraft_dir, "songs"),
+                                  on_error=lambda message: self.ui.post(messagebox.showerror, "Error", message))
 
         # Se elimina la inicialización temprana de pygame para evitar problemas en el proceso de congelado
         # pygame.mixer.init()
@@ -77,87 +2844,175 @@ class ResizableWindow:
             ("5.png", 0.26, 0.17, 0.74, 0.20, self.reproducir_musica),
             ("6.png", 0.00, 0.54, 0.70, 0.46, self.configurar_usuario)
         ]
-        self.buttons = []
-        self.images_cache: dict[tuple, list] = {}
-        self.create_buttons()
+        self.buttons: list[tk.Button] = []
+        self.images_cache = ScaledImageCache()
+        with STARTUP.phase("decodificar imágenes"):
+            self.source_images = self.load_source_images()
+        with STARTUP.phase("crear botones"):
+            self.create_buttons()
 
         self.window.bind('<Configure>', self._handle_resize)
+        self.window.bind('<F12>', self.mostrar_diagnostico)
+
+        # Lo que no hace falta para el primer frame se hace justo después de dibujarlo
+        self.window.after_idle(self._after_first_frame)
 
         # Variables de configuración de usuario
         self.username: str = ""
-        self.ram: int = 0
+        self.ram: int = 0  # 0 = tamaño automático según la RAM del equipo y los mods
+        self.jvm_profile: str = "auto"
+        self.cds: bool = True  # Etapa de class-data sharing antes de lanzar
         self.selected_version: str = ""
 
+    def _after_first_frame(self) -> None:
+        """Inicialización diferida: carpetas, índice, almacén compartido y precalentamiento de módulos."""
+        self.window.update_idletasks()
+        first_frame = time.perf_counter() - _T0
+        if self.profile_startup:
+            print(STARTUP.report(first_frame))
+            self.window.destroy()
+            return
+        logging.info(f"Primer frame en {first_frame * 1000:.0f} ms")
+        if TRACER.enabled:
+            for name, seconds in list(STARTUP.phases):
+                TRACER.record("startup", seconds, phase=name)
+            TRACER.record("startup.first_frame", first_frame)
+        self.create_minecraft_folders()
+        # Índice persistente de versiones/loaders instalados (evita reinstalar Fabric tras reiniciar)
+        self.index = InstalledIndex(self.minecraft_dir)
+        self.mod_index = ModIndex(self.minecraft_dir)
+        self.refresh_index()
+        self.load_user_settings()
+        if self.selected_version:
+            self.prepare_launch(self.selected_version)
+        # Motor de descargas compartido (pool de conexiones reutilizable entre lotes)
+        self.store = ArtifactStore.default()
+        self.downloader.store = self.store
+        threading.Thread(target=self._warm_up, daemon=True).start()
+        self.preguntar_version()  # Pregunta la versión vanilla si aún no se ha instalado
+
+    def _warm_up(self) -> None:
+        """Importa en segundo plano los módulos que se usarán al instalar o lanzar el juego."""
+        for module in (requests, minecraft_launcher_lib):
+            try:
+                module.load()
+            except Exception as e:
+                logging.warning(f"No se pudo precargar {module._name}: {e}")
+        self.mod_index.refresh()
+
     def create_minecraft_folders(self) -> None:
         """Crea las carpetas necesarias para el cliente Minecraft."""
-        folders = [
-            self.minecraft_dir,
-            os.path.join(self.minecraft_dir, "assets"),
-            os.path.join(self.minecraft_dir, "songs"),
-            os.path.join(self.minecraft_dir, "libraries"),
-            os.path.join(self.minecraft_dir, "runtime"),
-            os.path.join(self.minecraft_dir, "mods")  # Para los mods
-        ]
-        for folder in folders:
-            if not os.path.exists(folder):
-                os.makedirs(folder)
-                logging.info(f"Carpeta creada: {folder}")
+        create_minecraft_folders(self.minecraft_dir)
+
+    def load_user_settings(self) -> None:
+        """Recupera la configuración guardada (también la que deja --provision)."""
+        settings = load_settings(self.minecraft_dir)
+        self.username = settings.get("username", self.username)
+        self.ram = settings.get("ram", self.ram)
+        self.jvm_profile = settings.get("jvm_profile", self.jvm_profile)
+        self.cds = settings.get("cds", self.cds)
+        self.downloader.configure(settings.get("download_limit_mb", DOWNLOAD_LIMIT_MB), settings.get("mirrors"))
+        if settings.get("selected_version") in self.index.data["versions"]:
+            self.selected_version = settings["selected_version"]
+
+    def save_user_settings(self) -> None:
+        # Se conservan las claves que no se editan desde la interfaz (espejos, límite de descarga)
+        settings = load_settings(self.minecraft_dir)
+        settings.update({"username": self.username, "ram": self.ram, "jvm_profile": self.jvm_profile,
+                         "cds": self.cds, "selected_version": self.selected_version})
+        save_settings(self.minecraft_dir, settings)
 
     def _handle_resize(self, event: tk.Event) -> None:
+        """
+        Durante el arrastre se reescala como mucho cada _resize_delay ms con un filtro barato;
+        cuando la ventana deja de cambiar de tamaño se hace una pasada final con LANCZOS.
+        """
         if event.widget != self.window:
             return
         current_time = time.time() * 1000
-        if self._resize_id:
-            self.window.after_cancel(self._resize_id)
+        if self._settle_id:
+            self.window.after_cancel(self._settle_id)
         if current_time - self._last_resize_time > self._resize_delay:
-            self.create_buttons()
+            self.layout_buttons(final=False)
             self._last_resize_time = current_time
-        else:
-            self._resize_id = self.window.after(self._resize_delay, self.create_buttons)
+        self._settle_id = self.window.after(self._resize_delay, self.layout_buttons)
 
-    def _cleanup_cache(self) -> None:
-        if len(self.images_cache) > self._max_cache_size:
-            for key in sorted(self.images_cache.keys())[:-self._max_cache_size]:
-                del self.images_cache[key]
+    def load_source_images(self) -> dict[str, Image.Image]:
+        """Decodifica una sola vez las imágenes originales de los botones."""
+        images = {}
+        for img_file, *_ in self.button_configs:
+            try:
+                with Image.open(resource_path(os.path.join("assets", img_file))) as img:
+                    images[img_file] = img.convert("RGBA")
+            except Exception as e:
+                logging.error(f"Error al cargar la imagen {img_file}: {e}")
+        return images
+
+    def scaled_image(self, img_file: str, size: tuple[int, int], final: bool):
+        """
+        Devuelve la imagen del botón escalada a size. Las versiones LANCZOS se guardan en la
+        caché LRU; las rápidas (BILINEAR, durante el arrastre) no, porque cada tamaño intermedio
+        solo se ve una vez y expulsaría a los tamaños que se usan de verdad.
+        """
+        cached = self.images_cache.get((img_file, size))
+        if cached is not None:
+            return cached
+        source = self.source_images.get(img_file)
+        if source is None:
+            return None
+        resample = Image.Resampling.LANCZOS if final else Image.Resampling.BILINEAR
+        photo = ImageTk.PhotoImage(source.resize(size, resample))
+        if final:
+            self.images_cache.put((img_file, size), photo, size)
+        return photo
 
     def create_buttons(self) -> None:
-        """Crea y posiciona los botones en la ventana según la configuración."""
-        for button in self.buttons:
-            button.destroy()
-        self.buttons.clear()
+        """Crea una sola vez los botones de la ventana; después solo se reconfiguran."""
+        with TRACER.span("ui.create_buttons", buttons=len(self.button_configs)):
+            for img_file, rx, ry, rw, rh, command in self.button_configs:
+                button = tk.Button(self.window, command=command, borderwidth=0, highlightthickness=0)
+                self.buttons.append(button)
+            self.layout_buttons()
+
+    def layout_buttons(self, final: bool = True) -> None:
+        """Posiciona los botones existentes y les asigna la imagen escalada al tamaño actual."""
+        self._settle_id = None
         width = self.window.winfo_width()
         height = self.window.winfo_height()
-        cache_key = (width, height)
-        if cache_key in self.images_cache:
-            cached_buttons = self.images_cache[cache_key]
-            for (x, y, w, h, command), photo in cached_buttons:
-                button = tk.Button(self.window, image=photo, command=command,
-                                   borderwidth=0, highlightthickness=0)
-                button.image = photo
-                button.place(x=x, y=y, width=w, height=h)
-                self.buttons.append(button)
-            return
-        cached_buttons = []
-        for img_file, rx, ry, rw, rh, command in self.button_configs:
+        with TRACER.span("ui.layout_buttons", final=final, width=width, height=height):
+            self._place_buttons(width, height, final)
+
+    def _place_buttons(self, width: int, height: int, final: bool) -> None:
+        for button, (img_file, rx, ry, rw, rh, command) in zip(self.buttons, self.button_configs):
             try:
                 x = int(rx * width)
                 y = int(ry * height)
-                w1 = int(rw * width)
-                h1 = int(rh * height)
-                img_path = resource_path(os.path.join("assets", img_file))
-                img = Image.open(img_path)
-                img = img.resize((w1, h1), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                button = tk.Button(self.window, image=photo, command=command,
-                                   borderwidth=0, highlightthickness=0)
-                button.image = photo
+                w1 = max(int(rw * width), 1)
+                h1 = max(int(rh * height), 1)
+                photo = self.scaled_image(img_file, (w1, h1), final)
+                if photo is not None and photo is not getattr(button, "image", None):
+                    button.config(image=photo)
+                    button.image = photo
                 button.place(x=x, y=y, width=w1, height=h1)
-                cached_buttons.append(((x, y, w1, h1, command), photo))
-                self.buttons.append(button)
             except Exception as e:
-                logging.error(f"Error al crear botón {img_file}: {e}")
-        self.images_cache[cache_key] = cached_buttons
-        self._cleanup_cache()
+                logging.error(f"Error al colocar el botón {img_file}: {e}")
+
+    def refresh_index(self) -> None:
+        """Actualiza el índice de versiones instaladas y el mapa de versiones Fabric."""
+        self.index.refresh()
+        installed = self.index.fabric_versions()
+        self.fabric_versions.clear()
+        self.fabric_versions.update(installed)
+
+    def ingest_into_store(self, version_id: str) -> None:
+        """Añade al almacén compartido los archivos de una versión recién instalada."""
+        if not self.store:
+            return
+        try:
+            added = self.store.ingest(version_files(self.minecraft_dir, version_id))
+            logging.info(f"{added} archivos de {version_id} añadidos al almacén compartido")
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"No se pudo actualizar el almacén compartido con {version_id}: {e}")
 
     def preguntar_version(self) -> None:
         """Pregunta la versión vanilla de Minecraft a instalar si aún no se ha instalado."""
@@ -176,16 +3031,26 @@ class ResizableWindow:
                 messagebox.showerror("Error", "Debe ingresar una versión válida.")
                 return
 
+            task = self.show_progress(f"Instalando Minecraft {ver}")
+            # El progreso se ve en el panel compartido; la ventana modal ya no hace falta
+            win.grab_release()
+            win.withdraw()
+
+            def on_event(event: InstallEvent) -> None:
+                task.update(event.percent, event.describe())
+
             def install_task() -> None:
                 try:
-                    messagebox.showinfo("Info", f"Instalando Minecraft {ver}...\nPuede tardar varios minutos.")
-                    minecraft_launcher_lib.install.install_minecraft_version(ver, self.minecraft_dir)
-                    self.window.after(0, lambda: messagebox.showinfo("Éxito", f"Minecraft {ver} instalado correctamente"))
+                    install_version(self.minecraft_dir, ver, self.downloader, on_event)
+                    self.ingest_into_store(ver)
+                    self.refresh_index()
+                    self.ui.post(messagebox.showinfo, "Éxito", f"Minecraft {ver} instalado correctamente")
                 except Exception as e:
                     logging.exception("Error al instalar la versión de Minecraft.")
-                    self.window.after(0, lambda: messagebox.showerror("Error", f"No se pudo instalar {ver}: {e}"))
+                    self.ui.post(messagebox.showerror, "Error", f"No se pudo instalar {ver}: {e}")
                 finally:
-                    self.window.after(0, win.destroy)
+                    task.finish()
+                    self.ui.post(win.destroy)
 
             threading.Thread(target=install_task, daemon=True).start()
 
@@ -213,109 +3078,98 @@ class ResizableWindow:
 
             def fabric_install_task() -> None:
                 try:
-                    default_fab = "0.16.10"  # Versión actualizada de Fabric
-                    self.window.after(0, lambda: messagebox.showinfo("Info", f"Instalando Fabric {default_fab} para Minecraft {ver}...\nPuede tardar."))
-                    minecraft_launcher_lib.fabric.install_fabric(ver, self.minecraft_dir, default_fab)
-                    fab_id = f"fabric-loader-{default_fab}-{ver}"
+                    default_fab = FABRIC_LOADER_VERSION
+                    task = self.show_progress(f"Instalando Fabric {default_fab} para Minecraft {ver}")
+                    try:
+                        fab_id = install_fabric_loader(self.minecraft_dir, ver, default_fab, self.downloader)
+                    finally:
+                        task.finish()
                     self.fabric_versions[ver] = fab_id
-                    self.window.after(0, lambda: messagebox.showinfo("Éxito", f"Fabric {default_fab} instalado para Minecraft {ver}."))
-                    # Instalar Fabric API obligatoriamente
-                    self.download_mod_direct("FabricAPI", FABRIC_API_URL)
-                    # Preguntar por mods adicionales
-                    self.post_fabric_install_prompt(ver)
+                    self.ingest_into_store(fab_id)
+                    self.refresh_index()
+                    self.ui.post(messagebox.showinfo, "Éxito", f"Fabric {default_fab} instalado para Minecraft {ver}.")
+                    # Fabric API es obligatorio; se descarga en el mismo lote que los mods adicionales
+                    self.post_fabric_install_prompt(ver, required=[("FabricAPI", FABRIC_API_URL)])
                 except Exception as e:
                     logging.exception("Error al instalar Fabric.")
-                    self.window.after(0, lambda: messagebox.showerror("Error", f"No se pudo instalar Fabric: {e}"))
+                    self.ui.post(messagebox.showerror, "Error", f"No se pudo instalar Fabric: {e}")
                 finally:
-                    self.window.after(0, win.destroy)
+                    self.ui.post(win.destroy)
 
+            win.grab_release()
+            win.withdraw()
             threading.Thread(target=fabric_install_task, daemon=True).start()
 
         tk.Button(win, text="Instalar Fabric", command=instalar).pack(pady=10)
 
-    def post_fabric_install_prompt(self, vanilla_ver: str) -> None:
+    def post_fabric_install_prompt(self, vanilla_ver: str,
+                                   required: Optional[list[tuple[str, str]]] = None) -> None:
         """
-        Después de instalar Fabric (y Fabric API), pregunta si se desean instalar mods adicionales.
+        Después de instalar Fabric, pregunta si se desean instalar mods adicionales y los
+        descarga en un único lote junto con los mods obligatorios (required).
         Se guarda un registro en un archivo para no repetir la acción para esa versión.
+        Se puede llamar desde un hilo de trabajo: las preguntas se hacen en el hilo de Tk.
         """
+        mods = list(required or [])
         mod_record = os.path.join(self.minecraft_dir, "mods", f"mods_installed_{vanilla_ver}.txt")
-        if os.path.exists(mod_record):
-            return
-        if messagebox.askyesno("Instalar mod de skin", "¿Quieres instalar el mod de skin (SkinOverrides)?"):
-            self.download_mod_direct("SkinOverrides", SKIN_OVERRIDES_URL)
-        if messagebox.askyesno("Instalar mods de optimización", "¿Quieres instalar los mods de optimización (Sodium y Lithium)?"):
-            self.download_mod_direct("Sodium", SODIUM_URL)
-            self.download_mod_direct("Lithium", LITHIUM_URL)
-        with open(mod_record, "w") as f:
-            f.write("mods_installed")
+        if not os.path.exists(mod_record):
+            if self.ui.call(messagebox.askyesno, "Instalar mod de skin", "¿Quieres instalar el mod de skin (SkinOverrides)?"):
+                mods.append(("SkinOverrides", SKIN_OVERRIDES_URL))
+            if self.ui.call(messagebox.askyesno, "Instalar mods de optimización", "¿Quieres instalar los mods de optimización (Sodium y Lithium)?"):
+                mods.append(("Sodium", SODIUM_URL))
+                mods.append(("Lithium", LITHIUM_URL))
+            with open(mod_record, "w") as f:
+                f.write("mods_installed")
+        if mods:
+            self.download_mods(mods)
+
+    def show_progress(self, title: str, text: str = "") -> ProgressTask:
+        """Añade una tarea al panel de progreso compartido (se puede llamar desde cualquier hilo)."""
+        return self.ui.progress_task(title, text)
 
     def download_mod_direct(self, mod_name: str, url: str) -> None:
+        """Descarga un único mod en la carpeta 'mods' (ver download_mods)."""
+        self.download_mods([(mod_name, url)])
+
+    def download_mods(self, mods: list[tuple[str, str]]) -> None:
         """
-        Descarga el mod desde la URL real y lo guarda en la carpeta 'mods'.
-        Se muestra una ventana con barra de progreso.
-        Además, si el mod a descargar no es FabricAPI, se verifica si ya está presente FabricAPI;
-        de lo contrario, se pregunta al usuario si desea descargarlo.
+        Descarga un lote de mods (nombre, URL) de forma concurrente y los guarda en la carpeta 'mods'.
+        El lote ocupa una fila del panel de progreso con el progreso agregado y la velocidad.
+        Si algún mod del lote no es FabricAPI y ningún jar de mods/ aporta fabric-api (según el
+        índice de mods) ni está en el lote, se pregunta al usuario si desea descargarlo también.
         """
         mods_folder = os.path.join(self.minecraft_dir, "mods")
         if not os.path.exists(mods_folder):
             os.makedirs(mods_folder)
-        if mod_name.lower() != "fabricapi":
-            fabricapi_found = any("fabric-api" in f.lower() for f in os.listdir(mods_folder))
-            if not fabricapi_found:
-                if messagebox.askyesno("Fabric API requerido", f"El mod {mod_name} requiere Fabric API. ¿Deseas descargarlo?"):
-                    self.download_mod_direct("FabricAPI", FABRIC_API_URL)
-        filename = urllib.parse.unquote(os.path.basename(url))
-        filepath = os.path.join(mods_folder, filename)
-
-        # Crear ventana de progreso
-        progress_win = tk.Toplevel(self.window)
-        progress_win.title(f"Descargando {mod_name}")
-        progress_win.geometry("350x100")
-        progress_win.transient(self.window)
-        progress_win.grab_set()
-        tk.Label(progress_win, text=f"Descargando {mod_name}...").pack(pady=(10, 0))
-        progressbar = ttk.Progressbar(progress_win, orient="horizontal", length=300, mode="determinate")
-        progressbar.pack(pady=10)
-        percent_label = tk.Label(progress_win, text="0%")
-        percent_label.pack()
-
-        # Variable compartida para actualizar el progreso (se usa un diccionario para evitar problemas con el scope)
-        progress_data = {"progress": 0}
-
-        def update_progress() -> None:
-            progressbar["value"] = progress_data["progress"]
-            percent_label.config(text=f"{progress_data['progress']:.0f}%")
-            if progress_data["progress"] < 100:
-                progress_win.after(100, update_progress)
-            else:
-                progress_win.destroy()
+        names = [name.lower() for name, _ in mods]
+        if any(name != "fabricapi" for name in names) and "fabricapi" not in names:
+            if not self.mod_index.has(FABRIC_API_ID):
+                extra = ", ".join(name for name, _ in mods)
+                if self.ui.call(messagebox.askyesno, "Fabric API requerido", f"Los mods {extra} requieren Fabric API. ¿Deseas descargarlo?"):
+                    mods = [("FabricAPI", FABRIC_API_URL)] + list(mods)
+        jobs = [DownloadJob(name, url, os.path.join(mods_folder, filename_from_url(url)), priority=PRIORITY_OPTIONAL)
+                for name, url in mods]
+        title = jobs[0].name if len(jobs) == 1 else f"{len(jobs)} mods"
+
+        task = self.show_progress(f"Descargando {title}", f"0/{len(jobs)} archivos")
 
-        update_progress()  # Inicia la actualización periódica de la barra
+        def on_progress(p: DownloadProgress) -> None:
+            task.update(p.percent, f"{p.files_done}/{p.files_total} archivos, {p.bytes_per_sec / 1048576:.2f} MiB/s")
 
         def download_task() -> None:
             try:
-                r = requests.get(url, stream=True)
-                r.raise_for_status()
-                total_length = r.headers.get('content-length')
-                if total_length is None:
-                    total_length = 0
-                else:
-                    total_length = int(total_length)
-                downloaded = 0
-                with open(filepath, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            if total_length:
-                                downloaded += len(chunk)
-                                progress_data["progress"] = min((downloaded / total_length) * 100, 100)
-                # Forzar 100% al finalizar
-                progress_data["progress"] = 100
-                self.window.after(0, lambda: messagebox.showinfo("Mod descargado", f"{mod_name} descargado y guardado en mods."))
-            except Exception as e:
-                logging.exception("Error en la descarga del mod.")
-                self.window.after(0, lambda: messagebox.showerror("Error", f"No se pudo descargar {mod_name}: {e}"))
-                progress_data["progress"] = 100  # Cerrar la ventana en caso de error
+                fill_modrinth_checksums(self.downloader.session, jobs)
+                results = self.downloader.run(jobs, on_progress)
+            finally:
+                task.finish()
+            self.mod_index.refresh()  # Lee los jars nuevos ahora y no al pulsar Jugar
+            failed = [r for r in results if not r.ok]
+            ok_names = ", ".join(r.job.name for r in results if r.ok and not r.skipped)
+            if failed:
+                detail = "\n".join(f"{r.job.name}: {r.error}" for r in failed)
+                self.ui.post(messagebox.showerror, "Error", f"No se pudieron descargar:\n{detail}")
+            if ok_names:
+                self.ui.post(messagebox.showinfo, "Mods descargados", f"{ok_names} descargado(s) y guardado(s) en mods.")
 
         threading.Thread(target=download_task, daemon=True).start()
 
@@ -333,23 +3187,54 @@ class ResizableWindow:
             logging.exception("Error al abrir la carpeta de versiones.")
             messagebox.showerror("Error", f"No se pudo abrir la carpeta de versiones: {e}")
 
+    def verificar_version(self, version_id: str) -> None:
+        """Verifica (y repara si hace falta) los archivos de una versión instalada."""
+        task = self.show_progress(f"Verificando {version_id}")
+
+        def on_event(event: InstallEvent) -> None:
+            task.update(event.percent, event.describe())
+
+        def verify_task() -> None:
+            try:
+                verifier = IntegrityVerifier(self.minecraft_dir)
+                files = version_files(self.minecraft_dir, version_id)
+                if version_id in self.fabric_versions.values():
+                    files += verifier.known_mod_files(self.downloader.session)
+                failing = verifier.verify(files, on_event)
+                if not failing:
+                    msg = f"{version_id}: {len(files)} archivos correctos."
+                    self.ui.post(messagebox.showinfo, "Verificación", msg)
+                    return
+                results = verifier.repair(failing, self.downloader, on_event)
+                repaired = sum(1 for r in results if r.ok)
+                msg = f"{version_id}: {len(failing)} archivos dañados o ausentes, {repaired} reparados."
+                if repaired < len(failing):
+                    self.ui.post(messagebox.showwarning, "Verificación", msg)
+                else:
+                    self.ui.post(messagebox.showinfo, "Verificación", msg)
+            except Exception as e:
+                logging.exception("Error al verificar la versión.")
+                self.ui.post(messagebox.showerror, "Error", f"No se pudo verificar {version_id}: {e}")
+            finally:
+                task.finish()
+
+        threading.Thread(target=verify_task, daemon=True).start()
+
     def mostrar_versiones(self) -> None:
         """
         Muestra las versiones instaladas para seleccionar
         la versión a iniciar. Permite activar Fabric mediante un Checkbutton y añade un botón
         para abrir la carpeta de versiones.
         """
-        versions = minecraft_launcher_lib.utils.get_installed_versions(self.minecraft_dir)
+        self.refresh_index()
+        versions = self.index.vanilla_versions()
         if not versions:
             messagebox.showinfo("Info", "No hay versiones instaladas")
             return
         win = tk.Toplevel(self.window)
         win.title("Seleccionar Versión")
         tk.Label(win, text="Elige una versión:").pack(pady=10)
-        for ver in versions:
-            ver_id = ver['id']
-            if "fabric-loader" in ver_id:
-                continue
+        for ver_id in versions:
             frame = tk.Frame(win)
             frame.pack(fill="x", padx=10, pady=5)
             tk.Label(frame, text=ver_id).pack(side="left")
@@ -363,16 +3248,20 @@ class ResizableWindow:
                     if messagebox.askyesno("Instalar Fabric", f"Fabric no instalado para {v}. ¿Instalarlo?"):
                         def install_fabric_task() -> None:
                             try:
-                                default_fab = "0.16.10"
-                                self.window.after(0, lambda: messagebox.showinfo("Info", f"Instalando Fabric {default_fab} para {v}..."))
-                                minecraft_launcher_lib.fabric.install_fabric(v, self.minecraft_dir, default_fab)
-                                fab_id = f"fabric-loader-{default_fab}-{v}"
+                                default_fab = FABRIC_LOADER_VERSION
+                                task = self.show_progress(f"Instalando Fabric {default_fab} para {v}")
+                                try:
+                                    fab_id = install_fabric_loader(self.minecraft_dir, v, default_fab, self.downloader)
+                                finally:
+                                    task.finish()
                                 self.fabric_versions[v] = fab_id
-                                self.window.after(0, lambda: widget.config(text="Activar Fabric"))
+                                self.ingest_into_store(fab_id)
+                                self.refresh_index()
+                                self.ui.post(lambda: widget.winfo_exists() and widget.config(text="Activar Fabric"))
                             except Exception as e:
                                 logging.exception("Error al instalar Fabric en la versión seleccionada.")
-                                self.window.after(0, lambda: messagebox.showerror("Error", f"No se pudo instalar Fabric: {e}"))
-                                var.set(False)
+                                self.ui.post(messagebox.showerror, "Error", f"No se pudo instalar Fabric: {e}")
+                                self.ui.post(var.set, False)
                         threading.Thread(target=install_fabric_task, daemon=True).start()
                     else:
                         var.set(False)
@@ -381,45 +3270,146 @@ class ResizableWindow:
             def on_select(v=ver_id, var=usar_fab):
                 if var.get() and (v in self.fabric_versions):
                     self.selected_version = self.fabric_versions[v]
-                    mod_record = os.path.join(self.minecraft_dir, "mods", f"mods_installed_{v}.txt")
-                    if not os.path.exists(mod_record):
+                    if not self.index.has_marker(v):
                         self.post_fabric_install_prompt(v)
                     messagebox.showinfo("Info", f"Se ha activado Fabric para {v}.")
                 else:
                     self.selected_version = v
                     messagebox.showinfo("Info", f"Se ha seleccionado {v} sin Fabric.")
                 win.destroy()
+                self.save_user_settings()
+                self.prepare_launch(self.selected_version)
             tk.Button(frame, text="Seleccionar", command=on_select).pack(side="right")
+
+            def on_verify(v=ver_id, var=usar_fab):
+                self.verificar_version(self.fabric_versions[v] if var.get() and v in self.fabric_versions else v)
+            tk.Button(frame, text="Verificar", command=on_verify).pack(side="right", padx=5)
         tk.Button(win, text="Abrir carpeta de versiones", command=self.abrir_carpeta_versiones).pack(pady=10)
 
+    def prepare_launch(self, version_id: str) -> None:
+        """
+        Resuelve en segundo plano la plantilla de comando de la versión seleccionada, averigua la
+        versión de Java y precarga el classpath y los mods en la caché de páginas mientras el
+        usuario sigue en el launcher.
+        """
+        def task() -> None:
+            try:
+                command = self.command_cache.template(version_id, {'launcherVersion': LAUNCHER_VERSION})
+                java_major_version(command[0])
+                jars = self.command_cache.classpath(command)
+                if version_id.startswith("fabric-loader-"):
+                    jars += [os.path.join(self.mod_index.mods_dir, name) for name in self.mod_index.entries]
+                start = time.perf_counter()
+                size = readahead_files(jars)
+                logging.info(f"Precargados {len(jars)} jars ({size / 1048576:.0f} MiB) "
+                             f"en {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                logging.warning(f"No se pudo preparar el lanzamiento de {version_id}: {e}")
+        threading.Thread(target=task, daemon=True).start()
+
     def iniciar_minecraft(self) -> None:
-        """Inicia Minecraft usando la versión seleccionada (vanilla o con Fabric)."""
-        if not (self.username and self.ram):
-            messagebox.showerror("Error", "Configura usuario y RAM primero")
+        """
+        Inicia Minecraft usando la versión seleccionada (vanilla o con Fabric).
+        La plantilla de comando, 'java -version' y la comprobación de mods se resuelven en un hilo
+        de trabajo, que devuelve preguntas, avisos y errores al hilo de Tk por el despachador.
+        """
+        if not self.username:
+            messagebox.showerror("Error", "Configura el usuario primero")
             return
         if not self.selected_version:
             messagebox.showerror("Error", "Selecciona una versión primero")
             return
+        if self.game.is_running() or self._launching:
+            messagebox.showinfo("Info", "Minecraft ya está en ejecución")
+            return
         options = {
             'username': self.username,
             'uuid': '',
             'token': '',
-            'jvmArguments': [f"-Xmx{self.ram}G", f"-Xms{self.ram}G"],
-            'launcherVersion': "1.0.0"
+            'jvmArguments': [],
+            'launcherVersion': LAUNCHER_VERSION
         }
-        if self.selected_version.startswith("fabric-loader-"):
+        fabric = self.selected_version.startswith("fabric-loader-")
+        if fabric:
             version_dir = os.path.join(self.minecraft_dir, "versions", self.selected_version)
             jar_filename = self.selected_version + ".jar"
             jar_path = os.path.join(version_dir, jar_filename)
             if not os.path.exists(jar_path):
                 messagebox.showerror("Error", f"No se encontró {jar_filename} en {version_dir}")
                 return
+        self._launching = True
+        threading.Thread(target=self._launch_task, args=(self.selected_version, options, fabric),
+                         daemon=True).start()
+
+    def _launch_task(self, version_id: str, options: dict, fabric: bool) -> None:
+        """Resuelve el comando de lanzamiento e inicia el juego (en un hilo de trabajo)."""
         try:
-            cmd = minecraft_launcher_lib.command.get_minecraft_command(self.selected_version, self.minecraft_dir, options)
-            threading.Thread(target=lambda: subprocess.run(cmd), daemon=True).start()
+            # El ejecutable de Java sale de la plantilla de comando; con él se valida el perfil
+            java = self.command_cache.template(version_id, options)[0]
+            java_major = java_major_version(java)
+            mod_count = len(self.index.mods()) if fabric else 0
+            if fabric and not self.check_mods(version_id, java_major):
+                return
+            options['jvmArguments'], warnings = jvm_arguments(self.jvm_profile, java_major,
+                                                              total_memory_mb(), mod_count, fabric, self.ram)
+            if warnings:
+                self.ui.post(messagebox.showwarning, "Perfil de la JVM", "\n".join(warnings))
+            heap = options['jvmArguments'][0]
+            cds_mode = None
+            if self.cds:
+                mods = self.mod_index.entries if fabric else {}
+                cds_args, cds_mode = ClassDataSharing(self.minecraft_dir).jvm_arguments(
+                    version_id, mods, java, java_major)
+                options['jvmArguments'] += cds_args
+            with TRACER.span("launch.command", version=version_id, cds=cds_mode):
+                cmd = self.command_cache.get(version_id, options)
+            logging.info(f"Lanzando {version_id} con {' '.join(options['jvmArguments'])}")
+            self.game.start(cmd, cwd=self.minecraft_dir, info={"version": version_id, "xmx": heap,
+                                                                "profile": self.jvm_profile, "cds": cds_mode})
+            self.ui.post(self._update_game_status)
         except Exception as e:
             logging.exception("Error al iniciar Minecraft.")
-            messagebox.showerror("Error", f"Error al iniciar Minecraft: {e}")
+            self.ui.post(messagebox.showerror, "Error", f"Error al iniciar Minecraft: {e}")
+        finally:
+            self._launching = False
+
+    def check_mods(self, version_id: str, java_major: Optional[int]) -> bool:
+        """
+        Comprueba dependencias y versión de Minecraft de los mods. False si el usuario cancela.
+        Se llama desde el hilo de lanzamiento: la pregunta se hace en el hilo de Tk.
+        """
+        vanilla = self.index.data["versions"].get(version_id, {}).get("inheritsFrom")
+        if not vanilla:
+            return True
+        problems = self.mod_index.check(*fabric_version_parts(version_id, vanilla), java_major)
+        if not problems:
+            return True
+        for problem in problems:
+            logging.warning(f"Mods: {problem}")
+        shown = problems[:10] + ([f"... y {len(problems) - 10} más"] if len(problems) > 10 else [])
+        return self.ui.call(messagebox.askyesno, "Problemas con los mods",
+                            "\n".join(shown) + "\n\n¿Iniciar Minecraft de todas formas?")
+
+    def _update_game_status(self) -> None:
+        """Muestra en el título de la ventana las métricas del juego mientras está en marcha."""
+        status = self.game.status_text()
+        self.window.title(f"MNC_KA Client — {status}" if status else "MNC_KA Client")
+        if self.game.is_running():
+            self.window.after(int(GAME_SAMPLE_INTERVAL * 1000), self._update_game_status)
+
+    def _on_game_exit(self, metrics: dict) -> None:
+        """Se llama desde el hilo del supervisor cuando el juego termina."""
+        peak = metrics["peak_rss_bytes"] / 1024 ** 3
+        if metrics["state"] == "oom":
+            self.ui.post(lambda: messagebox.showerror(
+                "Memoria insuficiente",
+                f"Minecraft se cerró por falta de memoria (pico {peak:.2f} GB con {metrics.get('xmx')}).\n"
+                "Aumenta la RAM en la configuración."))
+        elif metrics["state"] == "crashed":
+            log_path = os.path.join(self.game.log_dir, "game.log")
+            self.ui.post(lambda: messagebox.showerror(
+                "Error", f"Minecraft se cerró inesperadamente (código {metrics['exit_code']}).\nRevisa {log_path}"))
+        self.ui.post(self._update_game_status)
 
     def abrir_juego(self) -> None:
         """Abre la URL del juego en el navegador."""
@@ -430,49 +3420,53 @@ class ResizableWindow:
         webbrowser.open("https://www.youtube.com/@MinecraftKA")
 
     def reproducir_musica(self) -> None:
-        """Reproduce la primera canción disponible en la carpeta 'songs'."""
-        # Inicializa pygame.mixer si aún no está inicializado
-        if not pygame.mixer.get_init():
-            pygame.mixer.init()
-        songs_folder = os.path.join(self.minecraft_dir, "songs")
-        try:
-            files = [f for f in os.listdir(songs_folder) if f.endswith(".mp3")]
-        except Exception as e:
-            logging.exception("Error al acceder a la carpeta de canciones.")
-            messagebox.showerror("Error", "No se pudo acceder a la carpeta 'songs'")
-            return
-        if files:
-            try:
-                pygame.mixer.music.load(os.path.join(songs_folder, files[0]))
-                pygame.mixer.music.play()
-            except Exception as e:
-                logging.exception("Error al reproducir la música.")
-                messagebox.showerror("Error", "Error al reproducir la canción")
-        else:
-            messagebox.showerror("Error", "No hay canciones en la carpeta 'songs'")
+        """Reproduce en bucle las canciones de la carpeta 'songs' (o pausa/reanuda si ya suenan)."""
+        self.music.toggle()
 
     def configurar_usuario(self) -> None:
-        """Configura el usuario y la RAM a usar."""
+        """Configura el usuario, la RAM (vacío = automática), el perfil de la JVM y la etapa de CDS."""
         win = tk.Toplevel(self.window)
         win.title("Configuración")
-        win.geometry("300x200")
+        win.geometry("300x340")
         tk.Label(win, text="Usuario:").pack(pady=5)
         user_entry = tk.Entry(win)
+        user_entry.insert(0, self.username)
         user_entry.pack(pady=5)
-        tk.Label(win, text="RAM (GB):").pack(pady=5)
+        total = total_memory_mb()
+        ram_hint = f" (máx. {max_heap_mb(total) // 1024}, vacío = auto)" if total else " (vacío = auto)"
+        tk.Label(win, text=f"RAM (GB){ram_hint}:").pack(pady=5)
         ram_entry = tk.Entry(win)
+        if self.ram:
+            ram_entry.insert(0, str(self.ram))
         ram_entry.pack(pady=5)
+        tk.Label(win, text="Perfil de la JVM:").pack(pady=5)
+        labels = {settings["label"]: key for key, settings in JVM_PROFILES.items()}
+        profile_var = tk.StringVar(value=JVM_PROFILES[self.jvm_profile]["label"])
+        ttk.Combobox(win, textvariable=profile_var, values=list(labels), state="readonly").pack(pady=5)
+        cds_var = tk.BooleanVar(value=self.cds)
+        tk.Checkbutton(win, text="Acelerar el arranque (CDS, Java 13+)", variable=cds_var).pack()
+        if self.selected_version:
+            medians = {label: sorted(times)[len(times) // 2]
+                       for label, times in self.game.launch_times(self.selected_version).items() if times}
+            if medians:
+                summary = ", ".join(f"{label}: {t:.1f} s" for label, t in medians.items())
+                tk.Label(win, text=f"Hasta la ventana ({summary})", font=("Arial", 8)).pack()
 
         def guardar() -> None:
             username = user_entry.get().strip()
-            ram_str = ram_entry.get().strip()
-            if not username or not ram_str:
-                messagebox.showerror("Error", "Debes llenar todos los campos")
+            ram_str = ram_entry.get().strip().lower()
+            if not username:
+                messagebox.showerror("Error", "Debes ingresar un usuario")
                 return
             try:
-                ram_value = int(ram_str)
+                ram_value = int(ram_str) if ram_str and ram_str != "auto" else 0
+                if ram_value < 0:
+                    raise ValueError
                 self.username = username
                 self.ram = ram_value
+                self.jvm_profile = labels.get(profile_var.get(), "auto")
+                self.cds = cds_var.get()
+                self.save_user_settings()
                 win.destroy()
                 messagebox.showinfo("Info", "Configuración guardada")
             except ValueError:
@@ -480,9 +3474,98 @@ class ResizableWindow:
 
         tk.Button(win, text="Guardar", command=guardar).pack(pady=10)
 
+    def mostrar_diagnostico(self, event: Optional[tk.Event] = None) -> None:
+        """Ventana de diagnóstico (F12): totales por operación y últimos spans, con exportación."""
+        win = tk.Toplevel(self.window)
+        win.title("Diagnóstico")
+        win.geometry("760x520")
+        status = tk.Label(win, anchor="w")
+        status.pack(fill="x", padx=10, pady=5)
+        columns = ("n", "total", "media", "max", "mib")
+        summary = ttk.Treeview(win, columns=columns, height=8)
+        summary.heading("#0", text="Operación")
+        for column, title in zip(columns, ("N", "Total (s)", "Media (ms)", "Máx. (ms)", "MiB")):
+            summary.heading(column, text=title)
+            summary.column(column, width=90, anchor="e")
+        summary.pack(fill="x", padx=10)
+        recent = ttk.Treeview(win, columns=("ms", "detalle"), height=12)
+        recent.heading("#0", text="Span")
+        recent.heading("ms", text="ms")
+        recent.heading("detalle", text="Atributos")
+        recent.column("ms", width=80, anchor="e")
+        recent.column("detalle", width=440)
+        recent.pack(fill="both", expand=True, padx=10, pady=5)
+
+        def refresh() -> None:
+            if not TRACER.enabled:
+                status.config(text="Trazas desactivadas: inicia con --trace o MNCKA_TRACE=1, o actívalas aquí.")
+            else:
+                status.config(text=f"{len(TRACER.spans)} spans en el búfer (máx. {TRACER.spans.maxlen})")
+            summary.delete(*summary.get_children())
+            for name, t in TRACER.summary().items():
+                summary.insert("", "end", text=name, values=(
+                    t["count"], f"{t['seconds']:.2f}", f"{t['seconds'] / t['count'] * 1000:.1f}",
+                    f"{t['max'] * 1000:.1f}", f"{t['bytes'] / 1048576:.1f}" if t["bytes"] else ""))
+            recent.delete(*recent.get_children())
+            for span in reversed(TRACER.snapshot()[-200:]):
+                details = ", ".join(f"{k}={v}" for k, v in span.items()
+                                    if k not in ("name", "start", "duration_ms", "thread"))
+                recent.insert("", "end", text=span["name"], values=(f"{span['duration_ms']:.1f}", details))
+
+        def export(kind: str) -> None:
+            try:
+                if kind == "jsonl":
+                    path = os.path.join(self.game.log_dir, "trace.jsonl")
+                    TRACER.export_jsonl(path)
+                else:
+                    path = os.path.join(self.game.log_dir, "metrics.prom")
+                    os.makedirs(self.game.log_dir, exist_ok=True)
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(TRACER.prometheus())
+                messagebox.showinfo("Diagnóstico", f"Exportado a {path}", parent=win)
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo exportar: {e}", parent=win)
+
+        def enable() -> None:
+            TRACER.enable()
+            refresh()
+
+        buttons = tk.Frame(win)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Actualizar", command=refresh).pack(side="left", padx=5)
+        tk.Button(buttons, text="Activar trazas", command=enable).pack(side="left", padx=5)
+        tk.Button(buttons, text="Exportar JSONL", command=lambda: export("jsonl")).pack(side="left", padx=5)
+        tk.Button(buttons, text="Exportar Prometheus", command=lambda: export("prom")).pack(side="left", padx=5)
+        refresh()
+
     def run(self) -> None:
         self.window.mainloop()
+        if TRACER.enabled:
+            path = os.path.join(self.game.log_dir, "trace.jsonl")
+            try:
+                logging.info(f"{TRACER.export_jsonl(path)} spans guardados en {path}")
+            except OSError as e:
+                logging.warning(f"No se pudieron guardar las trazas: {e}")
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Launcher de MNC_KA Client")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="muestra los tiempos de cada fase del arranque y sale tras el primer frame")
+    parser.add_argument("--provision", metavar="MANIFIESTO",
+                        help="instala sin interfaz gráfica lo indicado en un manifiesto JSON y sale")
+    parser.add_argument("--minecraft-dir", metavar="CARPETA",
+                        help="carpeta del cliente (por defecto 'MNC_KA Client' junto al launcher)")
+    parser.add_argument("--trace", action="store_true",
+                        help="registra trazas de tiempos (ventana de diagnóstico con F12; también MNCKA_TRACE=1)")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    app = ResizableWindow()
+    multiprocessing.freeze_support()  # Necesario para el pool de verificación en el ejecutable congelado
+    args = parse_args()
+    if args.trace:
+        TRACER.enable()
+    if args.provision:
+        sys.exit(provision(args.provision, args.minecraft_dir))
+    app = ResizableWindow(profile_startup=args.profile_startup, minecraft_dir=args.minecraft_dir)
     app.run()